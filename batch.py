@@ -0,0 +1,142 @@
+"""Vectorized simulation of many boards at once.
+
+``BoardBatch`` holds N boards of the same size as NumPy arrays of cell codes
+(orientation IDs, ``BLANK``, ``BLOCK``) plus the coordinates of each board's
+blank, and applies one keyboard roll per board in a single vectorized step.
+It follows the rules of ``Board.roll``; every board must have exactly one
+blank.
+"""
+
+import numpy as np
+
+from board import Board
+from cubes import BLANK, BLOCK, DELTA, DIRECTIONS, ROLL, SOLVED_ORIENT
+
+# ROLL extended with rows for BLANK and BLOCK so any cell code can be looked up
+ROLL_TABLE = np.array(list(ROLL) + [(BLANK,) * 5, (BLOCK,) * 5], dtype=np.uint8)
+# Blank and blocked cells never make a board unsolved
+SOLVED_TABLE = np.array(list(SOLVED_ORIENT) + [True, True], dtype=bool)
+DY = np.array([dy for dy, dx in DELTA], dtype=np.intp)
+DX = np.array([dx for dy, dx in DELTA], dtype=np.intp)
+
+
+class BoardBatch:
+    """N boards of one size stepped together.
+
+    Attributes:
+        cells: ``(N, size_y * size_x)`` uint8 cell codes, row by row.
+        digits: ``(N, size_y * size_x)`` uint32 tile numbers (0 for no cube).
+        blank_y: ``(N,)`` row of each board's blank.
+        blank_x: ``(N,)`` column of each board's blank.
+        moves: ``(N,)`` number of legal moves applied to each board.
+    """
+
+    __slots__ = ("size_y", "size_x", "digit_mode", "cells", "digits", "blank_y", "blank_x",
+                 "moves", "_rows")
+
+    def __init__(self, size_y, size_x, cells, digits=None, digit_mode=False):
+        """Wraps existing cell arrays.
+
+        Args:
+            size_y: Number of rows on each board.
+            size_x: Number of columns on each board.
+            cells: Array-like of shape ``(N, size_y * size_x)`` with cell codes.
+            digits: Matching tile numbers; numbered row by row when omitted.
+            digit_mode: Whether the tile numbers count towards the solved state.
+
+        Raises:
+            ValueError: If a board does not have exactly one blank.
+        """
+        self.size_y = size_y
+        self.size_x = size_x
+        self.digit_mode = digit_mode
+        self.cells = np.ascontiguousarray(cells, dtype=np.uint8).reshape(-1, size_y * size_x)
+        is_blank = self.cells == BLANK
+        if not (is_blank.sum(axis=1) == 1).all():
+            raise ValueError("every board in a batch needs exactly one blank")
+        blank = is_blank.argmax(axis=1)
+        self.blank_y = (blank // size_x).astype(np.intp)
+        self.blank_x = (blank % size_x).astype(np.intp)
+        if digits is None:
+            is_cube = self.cells < BLANK
+            digits = np.where(is_cube, np.cumsum(is_cube, axis=1), 0)
+        self.digits = np.ascontiguousarray(digits, dtype=np.uint32).reshape(self.cells.shape)
+        self.moves = np.zeros(len(self.cells), dtype=np.int64)
+        self._rows = np.arange(len(self.cells))
+
+    @classmethod
+    def from_board(cls, board, count):
+        """Makes a batch of ``count`` copies of a ``Board``."""
+        cells = np.frombuffer(bytes(board.cells), dtype=np.uint8)
+        digits = np.array(board.digits, dtype=np.uint32)
+        return cls(board.size_y, board.size_x, np.tile(cells, (count, 1)),
+                   np.tile(digits, (count, 1)), board.digit_mode)
+
+    @classmethod
+    def from_boards(cls, boards):
+        """Stacks ``Board`` objects of the same size and digit mode into a batch."""
+        first = boards[0]
+        cells = np.array([np.frombuffer(bytes(board.cells), dtype=np.uint8) for board in boards])
+        digits = np.array([board.digits for board in boards], dtype=np.uint32)
+        return cls(first.size_y, first.size_x, cells, digits, first.digit_mode)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def board(self, index):
+        """Returns board ``index`` as a standalone ``Board`` (without move history)."""
+        return Board.from_cells(self.size_y, self.size_x, self.cells[index].tobytes(),
+                                self.digits[index].tolist(), self.digit_mode)
+
+    def _sources(self, directions):
+        """Row, column and legality of the cube that would roll into each blank."""
+        src_y = self.blank_y - DY[directions]
+        src_x = self.blank_x - DX[directions]
+        inside = (directions > 0) & (src_y >= 0) & (src_y < self.size_y) \
+            & (src_x >= 0) & (src_x < self.size_x)
+        src = np.where(inside, src_y * self.size_x + src_x, 0)
+        legal = inside & (self.cells[self._rows, src] < BLANK)
+        return src_y, src_x, src, legal
+
+    def legal_mask(self):
+        """Returns an ``(N, 4)`` bool array: can each board roll up, left, down, right."""
+        mask = np.empty((len(self.cells), len(DIRECTIONS)), dtype=bool)
+        for vek in DIRECTIONS:
+            mask[:, vek - 1] = self._sources(np.full(len(self.cells), vek, dtype=np.intp))[3]
+        return mask
+
+    def step(self, directions):
+        """Applies one keyboard roll to every board.
+
+        Args:
+            directions: ``(N,)`` integer array of roll directions (1 up,
+                2 left, 3 down, 4 right; 0 leaves the board alone).
+
+        Returns:
+            ``(N,)`` bool array, True where the roll was legal and applied.
+        """
+        directions = np.asarray(directions, dtype=np.intp)
+        src_y, src_x, src, legal = self._sources(directions)
+        rows = self._rows[legal]
+        src = src[legal]
+        dst = self.blank_y[legal] * self.size_x + self.blank_x[legal]
+        cells = self.cells
+        cells[rows, dst] = ROLL_TABLE[cells[rows, src], directions[legal]]
+        cells[rows, src] = BLANK
+        digits = self.digits
+        digits[rows, dst] = digits[rows, src]
+        digits[rows, src] = 0
+        self.blank_y[legal] = src_y[legal]
+        self.blank_x[legal] = src_x[legal]
+        self.moves += legal
+        return legal
+
+    def solved(self):
+        """Returns an ``(N,)`` bool array with the solved state of every board."""
+        result = SOLVED_TABLE[self.cells].all(axis=1)
+        if self.digit_mode:
+            # The k-th tile met in row order must carry the number k
+            has_tile = self.digits != 0
+            in_order = np.where(has_tile, self.digits == np.cumsum(has_tile, axis=1), True)
+            result &= in_order.all(axis=1)
+        return result
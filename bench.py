@@ -0,0 +1,303 @@
+"""Headless benchmarks for the hot paths of Rolling Cubes.
+
+Times the cube tables, rolls, rendering (through SDL's dummy video driver,
+so no window opens), the solved check, scrambling and the solver, and writes
+the results as JSON so runs from different commits can be compared:
+
+    python bench.py --out before.json
+    python bench.py --out after.json --compare before.json
+
+Every result is a record ``{"name", "size", "value", "unit"}``; rates are
+per second, times in milliseconds.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Must be set before pygame opens a display
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from batch import BoardBatch
+from board import Board
+from cubes import BLANK, DIRECTIONS, ORIENTATIONS, ROLL, next_cubes
+from scramble import scramble, scramble_batch, scramble_pack
+from solver import solve_board
+
+SIZES = (3, 8, 16, 32, 64)  # Square board sizes to run the per-size benchmarks on
+MIN_TIME = 0.2    # Seconds each measurement runs for at least
+REPEATS = 3       # Measurements per benchmark; the best one is kept
+MAX_WINDOW = 2048  # Largest window side; cells shrink below CUBE_SIZE to fit
+CUBE_SIZE = 100
+
+
+def measure(func, min_time=MIN_TIME, repeats=REPEATS):
+    """Times a function.
+
+    Args:
+        func: Callable without arguments.
+        min_time: The call count doubles until a run takes this long.
+        repeats: Number of runs; the fastest one counts.
+
+    Returns:
+        Seconds per call.
+    """
+    count = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        count *= 2
+    best = elapsed
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / count
+
+
+def level_solved(level, level_digit, digit_mode):
+    """The solved check of the original draw loop, over ``level``/``level_digit``."""
+    solved = True
+    for row in level:
+        if not solved: break
+        for cube in row:
+            if cube[0] == " " or cube[0] == "X":
+                continue
+            if cube[0] == "W" or cube[1] == "Y":
+                solved = False
+                break
+    if digit_mode and solved:
+        num = 1
+        for row in level_digit:
+            if not solved: break
+            for dig in row:
+                if dig == "0": continue
+                if dig != str(num):
+                    solved = False
+                    break
+                num += 1
+    return solved
+
+
+def solved_board(size, digit_mode=False):
+    """A solved ``size`` x ``size`` board with one blank in the center (the worst case for checks)."""
+    cells = bytearray([ORIENTATIONS.index(("R", "B"))]) * (size * size)
+    cells[(size // 2) * size + size // 2] = BLANK
+    return Board.from_cells(size, size, cells, None, digit_mode)
+
+
+def bench_cubes():
+    """Cube table lookups: ``next_cubes`` calls and ``ROLL`` lookups per second."""
+    def call_next_cubes():
+        for top, face in ORIENTATIONS:
+            next_cubes(top, face)
+
+    def lookup_roll():
+        for orient in range(len(ORIENTATIONS)):
+            row = ROLL[orient]
+            for vek in DIRECTIONS:
+                row[vek]
+
+    return [
+        ("next_cubes", None, len(ORIENTATIONS) / measure(call_next_cubes), "calls/s"),
+        ("roll_table", None, len(ORIENTATIONS) * len(DIRECTIONS) / measure(lookup_roll), "lookups/s"),
+    ]
+
+
+def bench_rolls(size):
+    """Keyboard rolls on one ``Board`` and on a ``BoardBatch`` of 1000 boards."""
+    board = Board(size, size)
+    rng = random.Random(size)
+    directions = [rng.choice(DIRECTIONS) for _ in range(1000)]
+
+    def roll():
+        for vek in directions:
+            board.roll(vek)
+
+    batch = BoardBatch.from_board(Board(size, size), 1000)
+    steps = [np.full(len(batch), vek) for vek in directions[:10]]
+
+    def step():
+        for step_directions in steps:
+            batch.step(step_directions)
+
+    return [
+        ("roll", size, len(directions) / measure(roll), "rolls/s"),
+        ("batch_step", size, len(batch) * len(steps) / measure(step), "board-steps/s"),
+    ]
+
+
+def bench_render(size):
+    """Full-frame and dirty-frame rendering, plus the uncached polygon drawing."""
+    import pygame
+
+    from render import BoardRenderer, SpriteCache, draw_cell
+
+    cell = min(CUBE_SIZE, MAX_WINDOW // size)
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((size * cell, size * cell))
+    board = Board(size, size, True)
+    cache = SpriteCache(cell, pygame.font.SysFont("Verdana", 24))
+    renderer = BoardRenderer(screen, board, cache, True)
+    rng = random.Random(size)
+    for _ in range(size * size):
+        board.roll(rng.choice(DIRECTIONS))  # Mix orientations and tile numbers
+    renderer.draw_all()  # Fill the sprite cache first
+
+    def full_frame():
+        pygame.display.update(renderer.draw_all())
+
+    def dirty_frame():
+        move = board.roll(rng.choice(DIRECTIONS))
+        pygame.display.update(renderer.draw_moves([move] if move else []))
+
+    def polygon_frame():
+        for index, code in enumerate(board.cells):
+            draw_cell(screen, index % size * cell, index // size * cell, code, cell)
+        pygame.display.update()
+
+    results = [
+        ("render_cell", size, cell, "px"),
+        ("render_full", size, measure(full_frame) * 1000, "ms"),
+        ("render_dirty", size, measure(dirty_frame) * 1000, "ms"),
+        ("render_polygons", size, measure(polygon_frame, repeats=1) * 1000, "ms"),
+    ]
+    pygame.display.quit()
+    return results
+
+
+def bench_solved(size):
+    """Solved check on a solved board: the original list scan and ``Board.is_solved``."""
+    results = []
+    for digit_mode in (False, True):
+        board = solved_board(size, digit_mode)
+        level = board.to_level()
+        level_digit = board.to_level_digit()
+        suffix = "_digits" if digit_mode else ""
+        results.append(("solved_level" + suffix, size,
+                        measure(lambda: level_solved(level, level_digit, digit_mode)) * 1000, "ms"))
+        results.append(("solved_board" + suffix, size, measure(board.is_solved) * 1000, "ms"))
+    return results
+
+
+def bench_scramble(size):
+    """Scramble generation with ``scramble`` and ``scramble_batch``."""
+    board = Board(size, size)
+    rng = random.Random(size)
+    depth = 1000
+    return [
+        ("scramble", size, depth / measure(lambda: scramble(board, depth, rng)), "moves/s"),
+        ("scramble_batch", size, 1000 * 100 / measure(lambda: scramble_batch(board, 1000, 100)),
+         "moves/s"),
+    ]
+
+
+def bench_solve():
+    """Optimal solving of a fixed pack of 3x3 digit-mode scrambles."""
+    puzzles = scramble_pack(Board(3, 3, True), 5, 30, seed=11)
+    nodes = 0
+    start = time.perf_counter()
+    for puzzle in puzzles:
+        nodes += solve_board(puzzle).nodes
+    elapsed = time.perf_counter() - start
+    return [
+        ("solve_3x3_digits", None, elapsed * 1000 / len(puzzles), "ms"),
+        ("solve_nodes", None, nodes / elapsed, "nodes/s"),
+    ]
+
+
+def run(sizes=SIZES, only=None):
+    """Runs the benchmarks.
+
+    Args:
+        sizes: Board sizes for the per-size benchmarks.
+        only: Names of the benchmark groups to run (``cubes``, ``rolls``,
+            ``render``, ``solved``, ``scramble``, ``solve``); all when None.
+
+    Returns:
+        A JSON-ready dict with ``meta`` and ``results``.
+    """
+    groups = [("cubes", bench_cubes, False), ("rolls", bench_rolls, True),
+              ("render", bench_render, True), ("solved", bench_solved, True),
+              ("scramble", bench_scramble, True), ("solve", bench_solve, False)]
+    results = []
+    for group, func, per_size in groups:
+        if only and group not in only:
+            continue
+        for size in (sizes if per_size else [None]):
+            records = func(size) if per_size else func()
+            for name, size_, value, unit in records:
+                results.append({"name": name, "size": "%dx%d" % (size_, size_) if size_ else None,
+                                "value": value, "unit": unit})
+                print("%-20s %-8s %14.4f %s" % (name, results[-1]["size"] or "", value, unit),
+                      file=sys.stderr)
+    return {"meta": _meta(sizes), "results": results}
+
+
+def _meta(sizes):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    try:
+        import pygame
+        pygame_version = pygame.version.ver
+    except ImportError:
+        pygame_version = None
+    return {"commit": commit or None, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "pygame": pygame_version, "sizes": list(sizes)}
+
+
+def compare(old, new):
+    """Prints each result of ``new`` next to the same result of ``old``.
+
+    The ratio is > 1 when ``new`` is better (higher rate or shorter time).
+    """
+    before = {(record["name"], record["size"]): record["value"] for record in old["results"]}
+    for record in new["results"]:
+        value = before.get((record["name"], record["size"]))
+        if not value or not record["value"]:
+            continue
+        if record["unit"] == "px":
+            continue
+        ratio = value / record["value"] if record["unit"] == "ms" else record["value"] / value
+        print("%-20s %-8s %14.4f -> %14.4f %-14s x%.2f" % (record["name"], record["size"] or "",
+                                                         value, record["value"], record["unit"], ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Rolling Cubes benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="board sizes")
+    parser.add_argument("--only", nargs="+", help="benchmark groups to run")
+    parser.add_argument("--out", help="JSON file to write (default: stdout)")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+    report = run(args.sizes, args.only)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""Headless board engine for Rolling Cubes.
+
+The engine keeps the state that ``main()`` used to hold in ``level`` and
+``level_digit`` in flat arrays and implements the roll rules without any
+pygame, tkinter or streamlit import, so it can be driven by tools and tests
+as well as by the game window.
+"""
+
+import random
+from array import array
+
+from cubes import (BLANK, BLOCK, DELTA, DIRECTIONS, OPPOSITE, ORIENTATIONS, ROLL, SOLVED_ORIENT,
+                   code_cube, cube_code)
+from zobrist import cell_keys, roll_key, state_key, tile_key
+
+_NEIGHBORS = {}  # (size_y, size_x) -> neighbor table, shared by all boards of that size
+
+
+def neighbor_table(size_y, size_x):
+    """Returns the flat-index neighbor table of a board size.
+
+    Args:
+        size_y: Number of rows on the board.
+        size_x: Number of columns on the board.
+
+    Returns:
+        A tuple indexed by ``vek`` (slot 0 unused); ``table[vek][cell]`` is the
+        cell a cube standing on ``cell`` moves to when rolled in direction
+        ``vek``, or -1 when that would leave the board. The rows are int
+        arrays, so a 1000x1000 board needs 16 MB for all four.
+    """
+    key = (size_y, size_x)
+    table = _NEIGHBORS.get(key)
+    if table is None:
+        table = [()]
+        ncells = size_y * size_x
+        for vek in DIRECTIONS:
+            dy, dx = DELTA[vek]
+            # Shift every cell index by one step, then cut off what falls off an edge
+            row = array("i", range(dy * size_x + dx, ncells + dy * size_x + dx))
+            if dy < 0:
+                row[:size_x] = array("i", [-1]) * size_x
+            elif dy > 0:
+                row[ncells - size_x:] = array("i", [-1]) * size_x
+            if dx < 0:
+                row[::size_x] = array("i", [-1]) * size_y
+            elif dx > 0:
+                row[size_x - 1::size_x] = array("i", [-1]) * size_y
+            table.append(row)
+        table = _NEIGHBORS[key] = tuple(table)
+    return table
+
+
+class Board:
+    """Game state plus the move logic of ``main()``.
+
+    Cells are stored row by row in ``cells`` as cube orientation IDs, ``BLANK``
+    or ``BLOCK``; ``digits`` holds the matching tile numbers (0 for blank and
+    blocked cells) and ``blanks`` the flat indices of the blank cells.
+    ``key`` is the Zobrist key of the state (see ``zobrist``).
+
+    Two counters are kept up to date by every roll, so the solved state and
+    the distance to it can be read without scanning the grid:
+    ``misoriented`` counts cubes with white on top or a yellow face, and
+    ``out_of_order`` counts tiles that do not directly follow the tile
+    numbered one less in row order (the first tile must be 1); it is only
+    kept in digit mode. ``cube_count`` is the number of cubes, which rolls
+    never change.
+
+    Every roll has an exact inverse (the same cube rolling back the opposite
+    way), so ``undo`` and ``redo`` cost O(1): ``moves_stack`` holds the moves
+    made and ``redo_stack`` the moves undone since, last undone at the end.
+    """
+
+    __slots__ = ("size_y", "size_x", "cells", "digits", "blanks", "digit_mode",
+                 "moves", "moves_stack", "redo_stack", "key", "misoriented", "out_of_order",
+                 "cube_count", "_next", "_keys")
+
+    def __init__(self, size_y, size_x, digit_mode=False):
+        """Creates the starting board built by ``init_level``/``init_level_digit``.
+
+        Args:
+            size_y: Number of rows on the board.
+            size_x: Number of columns on the board.
+            digit_mode: Whether the tile numbers count towards the solved state.
+        """
+        self.size_y = size_y
+        self.size_x = size_x
+        self.digit_mode = digit_mode
+        self.cells = bytearray([ORIENTATIONS.index(("W", "B"))]) * (size_y * size_x)
+        self.cells[(size_y // 2) * size_x + size_x // 2] = BLANK  # Empty space in the center
+        self._reindex()
+
+    @classmethod
+    def from_level(cls, level, level_digit=None, digit_mode=False):
+        """Builds a board from the ``level``/``level_digit`` lists of lists.
+
+        Args:
+            level: Rows of ``[top, face]`` cells, as made by ``init_level``.
+            level_digit: Rows of tile number strings; numbered row by row when
+                omitted, like ``init_level_digit`` does.
+            digit_mode: Whether the tile numbers count towards the solved state.
+
+        Returns:
+            A new ``Board``.
+        """
+        digits = None
+        if level_digit is not None:
+            digits = [int(dig) for row in level_digit for dig in row]
+        return cls.from_cells(len(level), len(level[0]),
+                              [cube_code(cube) for row in level for cube in row], digits, digit_mode)
+
+    @classmethod
+    def from_cells(cls, size_y, size_x, cells, digits=None, digit_mode=False):
+        """Builds a board from flat, row-by-row cell codes.
+
+        Args:
+            size_y: Number of rows on the board.
+            size_x: Number of columns on the board.
+            cells: Orientation IDs, ``BLANK`` or ``BLOCK``, row by row.
+            digits: Matching tile numbers; numbered row by row when omitted.
+            digit_mode: Whether the tile numbers count towards the solved state.
+
+        Returns:
+            A new ``Board``.
+        """
+        board = cls.__new__(cls)
+        board.size_y = size_y
+        board.size_x = size_x
+        board.digit_mode = digit_mode
+        board.cells = bytearray(cells)
+        board._reindex(digits)
+        return board
+
+    def _reindex(self, digits=None):
+        """Rebuilds the tile numbers (unless given), the blank list, the key, the counters
+        and the move history."""
+        if digits is not None:
+            self.digits = array("I", digits)
+        else:
+            self.digits = array("I", [0]) * len(self.cells)
+            nn = 1  # Tile number counter
+            for cell, code in enumerate(self.cells):
+                if code < BLANK:
+                    self.digits[cell] = nn
+                    nn += 1
+        self.blanks = [cell for cell, code in enumerate(self.cells) if code == BLANK]
+        self.cube_count = len(self.cells) - len(self.blanks) - self.cells.count(BLOCK)
+        self.moves = 0
+        self.moves_stack = []
+        self.redo_stack = []
+        self._next = neighbor_table(self.size_y, self.size_x)
+        self._keys = cell_keys(len(self.cells))
+        self.key = state_key(self.cells, self.digits, self.digit_mode)
+        self.misoriented = sum(1 for code in self.cells if code < BLANK and not SOLVED_ORIENT[code])
+        self.out_of_order = 0
+        if self.digit_mode:
+            prev = 0  # Number of the previous tile; 0 makes the first tile count unless it is 1
+            for cell, code in enumerate(self.cells):
+                if code < BLANK:
+                    dig = self.digits[cell]
+                    self.out_of_order += dig != prev + 1
+                    prev = dig
+
+    def to_level(self):
+        """Returns the board as ``level`` rows of ``[top, face]`` cells."""
+        size_x = self.size_x
+        return [[code_cube(code) for code in self.cells[ny * size_x:(ny + 1) * size_x]]
+                for ny in range(self.size_y)]
+
+    def to_level_digit(self):
+        """Returns the tile numbers as ``level_digit`` rows of strings."""
+        size_x = self.size_x
+        return [[str(dig) for dig in self.digits[ny * size_x:(ny + 1) * size_x]]
+                for ny in range(self.size_y)]
+
+    def code(self, y, x):
+        """Returns the cell code (orientation ID, ``BLANK`` or ``BLOCK``) at (y, x)."""
+        return self.cells[y * self.size_x + x]
+
+    def move(self, y, x, vek):
+        """Rolls the cube at (y, x) one cell in direction ``vek``.
+
+        Args:
+            y: Row of the cube.
+            x: Column of the cube.
+            vek: Roll direction (1 up, 2 left, 3 down, 4 right).
+
+        Returns:
+            The move as stored in ``moves_stack`` (``[vek, nyp, nxp]``, with
+            the cell the cube rolled into), or None if the roll is not legal.
+        """
+        if not (0 <= y < self.size_y and 0 <= x < self.size_x):
+            return None
+        src = y * self.size_x + x
+        dst = self._next[vek][src]
+        if dst < 0 or self.cells[src] >= BLANK or self.cells[dst] != BLANK:
+            return None
+        return self._apply(src, dst, vek)
+
+    def roll(self, vek):
+        """Rolls the cube next to the blank into it, like the arrow keys do.
+
+        With several blanks the first one in row order is used.
+
+        Args:
+            vek: Roll direction (1 up, 2 left, 3 down, 4 right).
+
+        Returns:
+            The ``[vek, nyp, nxp]`` move, or None if nothing can roll that way.
+        """
+        blanks = self.blanks
+        if not blanks:
+            return None
+        dst = blanks[0] if len(blanks) == 1 else min(blanks)
+        src = self._next[OPPOSITE[vek]][dst]  # The cell behind the blank
+        if src < 0 or self.cells[src] >= BLANK:
+            return None
+        return self._apply(src, dst, vek)
+
+    def click(self, y, x):
+        """Rolls the clicked cube into a neighboring blank, like a mouse click.
+
+        When several neighbors are blank the last one checked (up, left,
+        down, right) wins, as in ``main()``.
+
+        Args:
+            y: Row of the clicked cell.
+            x: Column of the clicked cell.
+
+        Returns:
+            The ``[vek, nyp, nxp]`` move, or None if the click does nothing.
+        """
+        if not (0 <= y < self.size_y and 0 <= x < self.size_x):
+            return None
+        src = y * self.size_x + x
+        cells = self.cells
+        if cells[src] >= BLANK:  # Ignore empty and blocked cells
+            return None
+        for vek in (4, 3, 2, 1):
+            dst = self._next[vek][src]
+            if dst >= 0 and cells[dst] == BLANK:
+                return self._apply(src, dst, vek)
+        return None
+
+    def undo(self):
+        """Takes back the last move by rolling the cube back, in O(1).
+
+        Returns:
+            The roll made to take the move back, in the ``[vek, nyp, nxp]``
+            format (so it can be drawn and logged like any other move), or
+            None if there is nothing to undo.
+
+        Raises:
+            ValueError: If ``moves_stack`` does not match the board.
+        """
+        if not self.moves_stack:
+            return None
+        move = self.moves_stack[-1]
+        vek = OPPOSITE[move[0]]
+        src = move[1] * self.size_x + move[2]  # The cube now stands where it rolled to
+        dst = self._next[vek][src]
+        if dst < 0 or self.cells[src] >= BLANK or self.cells[dst] != BLANK:
+            raise ValueError("move history does not match the board")
+        self._roll(src, dst, vek)
+        self.moves_stack.pop()
+        self.redo_stack.append(move)
+        self.moves -= 1
+        return [vek, dst // self.size_x, dst % self.size_x]
+
+    def redo(self):
+        """Makes the last undone move again, in O(1).
+
+        Returns:
+            The ``[vek, nyp, nxp]`` move, or None if there is nothing to redo.
+
+        Raises:
+            ValueError: If ``redo_stack`` does not match the board.
+        """
+        if not self.redo_stack:
+            return None
+        move = self.redo_stack[-1]
+        vek = move[0]
+        dst = move[1] * self.size_x + move[2]
+        src = self._next[OPPOSITE[vek]][dst]
+        if src < 0 or self.cells[src] >= BLANK or self.cells[dst] != BLANK:
+            raise ValueError("move history does not match the board")
+        self._roll(src, dst, vek)
+        self.redo_stack.pop()
+        self.moves_stack.append(move)
+        self.moves += 1
+        return move
+
+    def seek(self, position):
+        """Undoes or redoes moves until ``position`` moves are made.
+
+        Costs one roll per move between here and ``position``; ``History``
+        seeks long histories through checkpoints instead.
+
+        Args:
+            position: Number of moves, from 0 to
+                ``len(moves_stack) + len(redo_stack)``.
+
+        Raises:
+            IndexError: If ``position`` is outside the history.
+        """
+        if not 0 <= position <= len(self.moves_stack) + len(self.redo_stack):
+            raise IndexError("position %d outside the move history" % position)
+        while len(self.moves_stack) > position:
+            self.undo()
+        while len(self.moves_stack) < position:
+            self.redo()
+
+    def snapshot(self):
+        """Returns a copy of the state, for ``restore`` (the move history is not included)."""
+        return (bytes(self.cells), array("I", self.digits), list(self.blanks), self.key,
+                self.misoriented, self.out_of_order, self.moves)
+
+    def restore(self, snapshot):
+        """Puts back a state taken by ``snapshot``, leaving the move history alone."""
+        cells, digits, blanks, self.key, self.misoriented, self.out_of_order, self.moves = snapshot
+        self.cells[:] = cells
+        self.digits[:] = digits
+        self.blanks[:] = blanks
+
+    def _apply(self, src, dst, vek):
+        """Rolls the cube on ``src`` into the blank ``dst`` and records the move."""
+        self._roll(src, dst, vek)
+        self.moves += 1
+        move = [vek, dst // self.size_x, dst % self.size_x]
+        self.moves_stack.append(move)
+        if self.redo_stack:
+            del self.redo_stack[:]  # A new move ends the undone line
+        return move
+
+    def _roll(self, src, dst, vek):
+        """Rolls the cube on ``src`` into the blank ``dst``: cells, blanks, key and counters."""
+        cells = self.cells
+        digits = self.digits
+        orient = cells[src]
+        tile = digits[src]
+        if self.digit_mode:
+            # Take the tile out of the row-order sequence...
+            prev, after = self._around(src)
+            self.out_of_order += ((after is not None and after != prev + 1)
+                                  - (tile != prev + 1) - (after is not None and after != tile + 1))
+        rolled = cells[dst] = ROLL[orient][vek]
+        cells[src] = BLANK
+        digits[dst] = tile
+        digits[src] = 0
+        self.misoriented += SOLVED_ORIENT[orient] - SOLVED_ORIENT[rolled]
+        self.key = roll_key(self.key, self._keys, src, dst, orient, rolled)
+        if self.digit_mode:
+            # ...and put it back in at its new cell
+            prev, after = self._around(dst)
+            self.out_of_order += ((tile != prev + 1) + (after is not None and after != tile + 1)
+                                  - (after is not None and after != prev + 1))
+            self.key ^= tile_key(src, tile) ^ tile_key(dst, tile)
+        blanks = self.blanks
+        blanks[blanks.index(dst) if len(blanks) > 1 else 0] = src
+
+    def _around(self, cell):
+        """Returns the numbers of the tiles before and after ``cell`` in row order.
+
+        The tile before is 0 and the tile after None when there is none.
+        Only blank and blocked cells are skipped, so this is O(1) unless
+        they form long runs.
+        """
+        cells = self.cells
+        before = cell - 1
+        while before >= 0 and cells[before] >= BLANK:
+            before -= 1
+        after = cell + 1
+        while after < len(cells) and cells[after] >= BLANK:
+            after += 1
+        return (self.digits[before] if before >= 0 else 0,
+                self.digits[after] if after < len(cells) else None)
+
+    def legal_moves(self):
+        """Lists every legal roll.
+
+        Returns:
+            A list of ``(y, x, vek)`` tuples: the cube at (y, x) can roll in
+            direction ``vek``.
+        """
+        result = []
+        cells = self.cells
+        size_x = self.size_x
+        for dst in self.blanks:
+            for vek in DIRECTIONS:
+                # The cube that would roll into dst sits one step against vek
+                src = self._next[OPPOSITE[vek]][dst]
+                if src >= 0 and cells[src] < BLANK:
+                    result.append((src // size_x, src % size_x, vek))
+        return result
+
+    def is_solved(self):
+        """Checks the solved state the way ``main()`` does, in O(1).
+
+        Every cube must show no white on top and no yellow face; in digit mode
+        the tile numbers must also read 1, 2, 3... row by row.
+        """
+        return self.misoriented == 0 and self.out_of_order == 0
+
+    @property
+    def remaining(self):
+        """Misoriented cubes plus out-of-order tiles; 0 exactly when solved."""
+        return self.misoriented + self.out_of_order
+
+    @property
+    def progress(self):
+        """Fraction of the goal reached, from 0.0 (every count wrong) to 1.0 (solved)."""
+        worst = self.cube_count * 2 if self.digit_mode else self.cube_count
+        return 1.0 - self.remaining / worst if worst else 1.0
+
+
+def test_counters():
+    """Incremental keys and counters must match a full rescan after every roll, undo and redo.
+
+    Kept next to the engine, as the repo has no test directory:
+    ``python -m pytest board.py`` or ``python board.py``.
+    """
+    rng = random.Random(1)
+    for digit_mode in (False, True):
+        for _ in range(20):
+            size_y, size_x = rng.randint(2, 5), rng.randint(2, 5)
+            cells = bytearray(rng.randrange(BLANK) for _ in range(size_y * size_x))
+            for cell in rng.sample(range(len(cells)), rng.randint(1, 3)):
+                cells[cell] = BLANK
+            for cell in rng.sample([cell for cell, code in enumerate(cells) if code < BLANK],
+                                   rng.randint(0, 2)):
+                cells[cell] = BLOCK
+            board = Board.from_cells(size_y, size_x, cells, None, digit_mode)
+            states = [board.snapshot()]
+            for _ in range(60):
+                moves = board.legal_moves()
+                if not moves:
+                    break
+                board.move(*rng.choice(moves))
+                states.append(board.snapshot())
+                rescan = Board.from_cells(size_y, size_x, board.cells, board.digits, digit_mode)
+                assert (board.key, board.misoriented, board.out_of_order) == \
+                    (rescan.key, rescan.misoriented, rescan.out_of_order)
+                assert sorted(board.blanks) == rescan.blanks
+                assert board.cube_count == rescan.cube_count
+            # Undo and redo must walk back through exactly the same states
+            for state in reversed(states[:-1]):
+                board.undo()
+                assert board.snapshot() == state
+            assert board.undo() is None
+            for state in states[1:]:
+                board.redo()
+                assert board.snapshot() == state
+            assert board.redo() is None
+
+
+if __name__ == "__main__":
+    test_counters()
+    print("counters OK")
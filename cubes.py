@@ -0,0 +1,165 @@
+"""Cube orientation model shared by the game and the headless tools.
+
+A cube is described in ``level`` by its top face and its face (``[top, face]``).
+Only 24 such pairs are valid, so every cube can be replaced by an orientation
+ID in ``range(24)`` and every roll by a lookup in a precomputed table.
+This module has no pygame, tkinter or streamlit dependency.
+"""
+
+CUBE_COLOR = [("W","#ffffea"), ("R","#973aa8"), ("B","#0000ff"),
+              ("Y","#ffff3f"), ("P","#ef476f"), ("G","#70e000")]  # Cube face colors
+
+# Roll directions, same values as 'vek' in main(): the direction the cube moves
+UP = 1
+LEFT = 2
+DOWN = 3
+RIGHT = 4
+DIRECTIONS = (UP, LEFT, DOWN, RIGHT)
+OPPOSITE = (0, DOWN, RIGHT, UP, LEFT)  # OPPOSITE[vek] undoes a roll in 'vek'
+DELTA = ((0, 0), (-1, 0), (0, -1), (1, 0), (0, 1))  # (dy, dx) of the moving cube
+
+# Cell codes for the non-cube cells when a board is stored as orientation IDs
+BLANK = 24  # Empty cell (" ")
+BLOCK = 25  # Blocked cell ("X")
+
+
+def next_cubes(top, face):
+    """Calculates the new orientation of a cube after a roll.
+
+    Args:
+        top: The current top face color of the cube (e.g., "W", "R").
+        face: The current front face color of the cube.
+
+    Returns:
+        A list representing the new colors of the cube's faces in their
+        correct positions after a roll. This is likely used to update the board.
+    """
+
+    for face_ind, COLOR_ONE in enumerate(CUBE_COLOR):
+        if COLOR_ONE[0] == face:
+            break  # Find the index of the current front face in CUBE_COLOR
+    for top_ind, COLOR_ONE in enumerate(CUBE_COLOR):
+        if COLOR_ONE[0] == top:
+            break  # Find the index of the current top face
+
+    back_ind = (top_ind + 3) % 6  # Calculate the index of the back face
+
+    # 'vek' likely determines roll direction (positive or negative)
+    vek = 1 - (top_ind % 2) * 2
+
+    face_set = CUBE_COLOR.copy()  # Create a copy to work with
+    face1 = min(top_ind, back_ind)  # Helps determine order of faces in face_set
+    face_set.pop(face1)
+    face_set.pop(face1 + 2)  # Remove two faces from the set
+
+    if vek < 0:  # Reverse the order for a roll in a certain direction
+        face_set.reverse()
+
+    # Rotate the face_set until the original 'face' color is at the front
+    while face_set[0][0] != face:
+        elem = face_set.pop(0)
+        face_set.append(elem)
+
+    return face_set
+
+
+def roll_cube(cube, vek):
+    """Rolls a cube one cell using the two-step ``next_cubes`` rule.
+
+    This is the reference rule the tables below are built from; the game
+    itself uses ``ROLL``.
+
+    Args:
+        cube: A ``[top, face]`` pair.
+        vek: Roll direction (``UP``, ``LEFT``, ``DOWN`` or ``RIGHT``).
+
+    Returns:
+        The ``[top, face]`` pair after the roll.
+    """
+    face_set = next_cubes(cube[0], cube[1])  # 1st rotation
+    face_set2 = next_cubes(face_set[4 - vek][0], cube[0])  # 2nd rotation, along the roll direction
+
+    if vek == UP:
+        return [face_set2[3][0], face_set2[2][0]]
+    if vek == DOWN:
+        return [face_set2[3][0], face_set2[0][0]]
+    return [face_set2[3][0], cube[1]]  # LEFT / RIGHT keep the face
+
+
+def _build_tables():
+    """Enumerates the 24 orientations and precomputes the lookup tables."""
+    letters = [color[0] for color in CUBE_COLOR]
+    orientations = []
+    for top_ind, top in enumerate(letters):
+        for face_ind, face in enumerate(letters):
+            # The face can be any color except the top and its opposite
+            if face_ind != top_ind and face_ind != (top_ind + 3) % 6:
+                orientations.append((top, face))
+    orient_id = {pair: nn for nn, pair in enumerate(orientations)}
+
+    # ROLL[o][vek]; slot 0 keeps the orientation so that vek == 0 is a no-op
+    roll = []
+    for pair in orientations:
+        row = [orient_id[pair]]
+        for vek in DIRECTIONS:
+            row.append(orient_id[tuple(roll_cube(list(pair), vek))])
+        roll.append(tuple(row))
+
+    # Side faces in the next_cubes order: front, left, back, right
+    sides = tuple(tuple(color[0] for color in next_cubes(top, face))
+                  for top, face in orientations)
+    return tuple(orientations), orient_id, tuple(roll), sides
+
+
+ORIENTATIONS, ORIENT_ID, ROLL, SIDES = _build_tables()
+
+COLOR_HEX = dict(CUBE_COLOR)
+TOP_COLOR = tuple(COLOR_HEX[top] for top, face in ORIENTATIONS)
+SIDE_COLORS = tuple(tuple(COLOR_HEX[side] for side in row) for row in SIDES)
+
+# A cube counts as solved when it shows no white on top and no yellow face
+SOLVED_ORIENT = tuple(top != "W" and face != "Y" for top, face in ORIENTATIONS)
+
+
+def cube_code(cube):
+    """Converts a ``level`` cell (``[top, face]``) into its cell code.
+
+    Args:
+        cube: A cell of ``level``: ``[" ", " "]``, ``["X", ...]`` or a cube.
+
+    Returns:
+        ``BLANK``, ``BLOCK`` or the orientation ID of the cube.
+    """
+    if cube[0] == " ":
+        return BLANK
+    if cube[0] == "X":
+        return BLOCK
+    return ORIENT_ID[(cube[0], cube[1])]
+
+
+def code_cube(code):
+    """Converts a cell code back into a ``level`` cell."""
+    if code == BLANK:
+        return [" ", " "]
+    if code == BLOCK:
+        return ["X", "X"]
+    return list(ORIENTATIONS[code])
+
+
+def test_tables():
+    """The tables must agree with next_cubes for every orientation and direction.
+
+    Kept next to the tables, as the repo has no test directory:
+    ``python -m pytest cubes.py`` or ``python cubes.py``.
+    """
+    for code, pair in enumerate(ORIENTATIONS):
+        assert list(SIDES[code]) == [color[0] for color in next_cubes(*pair)]
+        for vek in DIRECTIONS:
+            rolled = ROLL[code][vek]
+            assert list(ORIENTATIONS[rolled]) == roll_cube(list(pair), vek)
+            assert ROLL[rolled][OPPOSITE[vek]] == code
+
+
+if __name__ == "__main__":
+    test_tables()
+    print("%d orientations x %d directions OK" % (len(ORIENTATIONS), len(DIRECTIONS)))
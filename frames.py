@@ -0,0 +1,108 @@
+"""Off-screen rendering of boards to PNG images and NumPy arrays.
+
+Uses the sprites and blits of ``render`` on a plain ``Surface``, so it
+needs neither a window nor a display driver. Finished frames are kept in an
+LRU cache keyed by the board's Zobrist key, so identical states (the
+starting layout of every new game, positions reached again) are encoded
+once for all sessions of a server.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import pygame
+
+from render import BoardRenderer, SpriteCache
+
+MAX_IMAGE_SIZE = 800  # Widest or tallest frame in pixels; cells shrink to fit
+MAX_CELL_SIZE = 100   # Cell size of small boards (``CUBE_SIZE``)
+MIN_CELL_SIZE = 8     # Cell size floor, even if the frame gets larger than ``MAX_IMAGE_SIZE``
+CACHE_FRAMES = 1024   # Frames kept in the LRU cache
+
+
+def cell_size(board, max_image=MAX_IMAGE_SIZE):
+    """Returns the cell size that fits the board into ``max_image`` pixels."""
+    size = max_image // max(board.size_x, board.size_y)
+    return max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, size))
+
+
+class FrameRenderer:
+    """Renders boards off-screen, shared by every session of a server.
+
+    pygame surfaces are not safe to share between threads, so rendering is
+    serialized with a lock; cache hits only hold it for the lookup.
+
+    Attributes:
+        hits: Frames served from the cache.
+        misses: Frames rendered.
+    """
+
+    __slots__ = ("max_image", "hits", "misses", "_caches", "_frames", "_frames_limit", "_lock",
+                 "_font")
+
+    def __init__(self, max_image=MAX_IMAGE_SIZE, cache_frames=CACHE_FRAMES):
+        """Creates the renderer.
+
+        Args:
+            max_image: Widest or tallest frame in pixels.
+            cache_frames: Number of frames kept in the LRU cache.
+        """
+        if not pygame.font.get_init():
+            pygame.font.init()
+        self.max_image = max_image
+        self.hits = self.misses = 0
+        self._font = pygame.font.SysFont('Verdana', 24)
+        self._caches = {}  # Cell size -> SpriteCache
+        self._frames = OrderedDict()  # (state, format) -> PNG bytes or array
+        self._frames_limit = cache_frames
+        self._lock = threading.Lock()
+
+    def _key(self, board, fmt):
+        return (board.size_y, board.size_x, board.digit_mode, board.key, fmt)
+
+    def _get(self, board, fmt):
+        key = self._key(board, fmt)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return frame
+            self.misses += 1
+            surface = self._draw(board)
+            if fmt == "png":
+                frame = _encode_png(surface)
+            else:
+                frame = pygame.surfarray.array3d(surface).swapaxes(0, 1)
+                frame.flags.writeable = False  # Shared by every session that shows this state
+            self._frames[key] = frame
+            if len(self._frames) > self._frames_limit:
+                self._frames.popitem(last=False)
+            return frame
+
+    def _draw(self, board):
+        size = cell_size(board, self.max_image)
+        cache = self._caches.get(size)
+        if cache is None:
+            cache = self._caches[size] = SpriteCache(size, self._font)
+        surface = pygame.Surface((board.size_x * size, board.size_y * size))
+        BoardRenderer(surface, board, cache, board.digit_mode).draw_all()
+        return surface
+
+    def png(self, board):
+        """Returns the board as PNG bytes."""
+        return self._get(board, "png")
+
+    def array(self, board):
+        """Returns the board as a ``(height, width, 3)`` uint8 NumPy array.
+
+        The array is shared through the cache and read-only; copy it to change it.
+        """
+        return self._get(board, "array")
+
+
+def _encode_png(surface):
+    data = io.BytesIO()
+    pygame.image.save(surface, data, "frame.png")
+    return data.getvalue()
@@ -0,0 +1,200 @@
+"""Background hint engine: the best next move, found while the game runs.
+
+Searching inside ``main()`` would freeze the window, and a search thread
+would hold the GIL the event loop needs, so ``HintEngine`` searches in a
+worker process. Each board sent to it gets a generation number; the search
+polls its pipe, so a newer board stops the old search within 1024 nodes,
+and replies about older boards are dropped when they arrive.
+
+The search is the solver's IDA*. After every iteration, and when the budget
+runs out, the worker sends the first move towards the closest state reached
+so far (lowest heuristic), so a hint is usually available within
+milliseconds and improves as the bound grows; once a solution is found the
+hint is exact. Each board gets a node and a
+time budget; when it runs out the last hint stands and the engine is
+``done``, so the worker goes idle until the next board. The depth limit is
+counted from the heuristic of the board, so large boards, whose solutions
+are longer than any fixed limit, still get hints.
+
+    engine = HintEngine()
+    engine.submit(board)
+    ...
+    engine.poll()        # Never blocks: call it once per frame
+    if engine.hint:
+        board.move(*engine.hint.move)
+"""
+
+import multiprocessing
+import time
+
+from board import Board
+from cubes import DELTA
+from solver import heuristic, heuristic_tables, solve_board, table_key
+
+MAX_EXTRA = 80      # Moves searched for beyond the heuristic lower bound
+MAX_NODES = 500000  # Node budget per board (about 1.5 s)
+TIME_LIMIT = 2.0    # Time budget per board, in seconds
+MAX_CELLS = 256     # Larger boards get no hints (digit-mode tables take 1.6 s at 16x16)
+
+
+class Hint:
+    """A suggested move.
+
+    Attributes:
+        move: ``(y, x, vek)``: roll the cube at (y, x) in direction ``vek``
+            (``Board.move(*hint.move)``).
+        exact: Whether the move starts an optimal solution.
+        distance: Length of the optimal solution when exact, otherwise a
+            lower bound on it.
+        nodes: Nodes searched for this board so far.
+    """
+
+    __slots__ = ("move", "exact", "distance", "nodes")
+
+    def __init__(self, move, exact, distance, nodes):
+        self.move = move
+        self.exact = exact
+        self.distance = distance
+        self.nodes = nodes
+
+    def __repr__(self):
+        return "Hint(move=%r, exact=%s, distance=%d, nodes=%d)" % (
+            self.move, self.exact, self.distance, self.nodes)
+
+
+def _cube_move(move):
+    """Turns a ``[vek, nyp, nxp]`` move into the ``(y, x, vek)`` of the cube that rolls."""
+    vek, nyp, nxp = move
+    dy, dx = DELTA[vek]
+    return (nyp - dy, nxp - dx, vek)
+
+
+def _worker(conn, max_extra, max_nodes, time_limit):
+    """Worker process: searches each board it is sent until a newer one arrives."""
+    tables = {}  # Board geometry -> heuristic tables
+    while True:
+        request = conn.recv()
+        while conn.poll():
+            request = conn.recv()  # Only the newest board matters
+        if request is None:
+            return
+        generation, size_y, size_x, cells, digits, digit_mode = request
+        board = Board.from_cells(size_y, size_x, cells, digits, digit_mode)
+        key = table_key(board)
+        if key not in tables:
+            tables[key] = heuristic_tables(board)
+        h = heuristic(board, tables[key])
+        max_depth = h + max_extra if h is not None else 0  # No bound to count from: unsolvable
+
+        def progress(distance, nodes, closest):
+            if closest:
+                conn.send((generation, Hint(_cube_move(closest[0]), False, distance, nodes), False))
+
+        result = solve_board(board, max_depth, tables[key], max_nodes=max_nodes,
+                             time_limit=time_limit, stop=conn.poll, progress=progress)
+        if result.budget == "stopped":
+            continue  # A newer board is waiting
+        hint = None  # Solved already, or out of budget: the last progress hint stands
+        if result.moves:
+            hint = Hint(_cube_move(result.moves[0]), True, len(result.moves), result.nodes)
+        conn.send((generation, hint, True))
+
+
+class HintEngine:
+    """Finds hints for the latest board in a worker process.
+
+    Attributes:
+        hint: Best ``Hint`` received for the last submitted board, or None
+            (nothing found yet, board already solved, or too large).
+        done: Whether the search for the last submitted board has ended.
+    """
+
+    __slots__ = ("hint", "done", "_conn", "_process", "_generation")
+
+    def __init__(self, max_extra=MAX_EXTRA, max_nodes=MAX_NODES, time_limit=TIME_LIMIT):
+        """Starts the worker process.
+
+        Args:
+            max_extra: Longest solution searched for, in moves beyond the
+                heuristic lower bound of the board.
+            max_nodes: Node budget per board, or None for no limit.
+            time_limit: Time budget per board in seconds, or None for no
+                limit. Without either budget a board is searched until it
+                is solved, ``max_extra`` is exceeded or a newer one arrives.
+        """
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_worker, args=(child, max_extra, max_nodes, time_limit), daemon=True)
+        self._process.start()
+        child.close()
+        self._generation = 0
+        self.hint = None
+        self.done = True
+
+    def submit(self, board):
+        """Starts searching a board; the search of the previous one is dropped.
+
+        The board is copied, so it may change right away.
+        """
+        self._generation += 1
+        self.hint = None
+        if len(board.cells) > MAX_CELLS:
+            self.done = True
+            return
+        self.done = False
+        self._conn.send((self._generation, board.size_y, board.size_x, bytes(board.cells),
+                         board.digits, board.digit_mode))
+
+    def poll(self, timeout=0):
+        """Collects what the worker sent about the last submitted board.
+
+        Args:
+            timeout: Seconds to wait for news; 0 never blocks.
+
+        Returns:
+            Whether ``hint`` or ``done`` changed.
+        """
+        changed = False
+        conn = self._conn
+        while conn.poll(0 if changed else timeout):
+            try:
+                generation, hint, done = conn.recv()
+            except EOFError:  # The worker died: no more hints
+                self.done = True
+                return True
+            if generation != self._generation:
+                continue  # About a board the player has moved on from
+            if hint is not None:
+                self.hint = hint
+            self.done = done
+            changed = True
+        return changed
+
+    def wait(self, timeout=None):
+        """Blocks until the search of the last submitted board ends or ``timeout`` seconds pass.
+
+        Returns:
+            The best ``Hint`` so far, or None.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self.done:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            self.poll(remaining)
+        return self.hint
+
+    def close(self):
+        """Stops the worker process."""
+        if self._process.is_alive():
+            self._conn.send(None)
+            self._process.join(1)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,226 @@
+"""Seeking through long move histories.
+
+``Board.undo`` and ``Board.redo`` step one move at a time, so jumping from
+move 0 to move 500,000 of a replay would take 500,000 rolls. ``History``
+keeps a snapshot of the board every ``interval`` moves of the board's own
+history (``moves_stack`` plus ``redo_stack``) and seeks from the closest
+one, rolling forwards with ``redo`` or backwards with ``undo``, so a seek
+costs at most ``interval / 2`` rolls once the snapshots exist (plus moving
+the moves in between from one stack to the other, a plain list copy). The
+snapshots are taken the first time the history passes each multiple of
+``interval``.
+
+    python history.py session.rclog 500000
+"""
+
+import argparse
+import random
+import time
+
+from board import Board
+from cubes import BLANK
+from movelog import MoveLog
+
+CHECKPOINT_INTERVAL = 1024  # Moves between snapshots on small boards
+CHECKPOINT_BYTES = 8        # Snapshot bytes allowed per move: large boards get sparser snapshots
+
+
+class History:
+    """Checkpointed seeking over a board's move history.
+
+    Snapshots are taken by ``mark``, which the owner of the board calls
+    after every move it makes (``seek`` and ``from_log`` do so themselves).
+    A new move made on the board after an undo drops the undone moves, and
+    with them the snapshots taken past that point; ``seek`` notices and
+    ignores them.
+
+    Attributes:
+        board: The ``Board`` whose history is seeked.
+        interval: Moves between snapshots.
+    """
+
+    __slots__ = ("board", "interval", "_stack", "_checkpoints")
+
+    def __init__(self, board, interval=None):
+        """Starts checkpointing a board's history.
+
+        Args:
+            board: The ``Board``; its ``moves_stack`` and ``redo_stack`` are the history.
+            interval: Moves between snapshots; by default ``CHECKPOINT_INTERVAL``,
+                or more on boards so large that snapshots would take more than
+                ``CHECKPOINT_BYTES`` per move.
+        """
+        self.board = board
+        if interval is None:
+            # A snapshot holds five bytes per cell
+            interval = max(CHECKPOINT_INTERVAL, len(board.cells) * 5 // CHECKPOINT_BYTES)
+        self.interval = interval
+        self._stack = None  # The moves_stack the snapshots belong to
+        self._checkpoints = {}  # Multiple of interval -> (snapshot, last move before it)
+
+    @classmethod
+    def from_log(cls, path, interval=None):
+        """Loads a move log as a history, with the board at its last move.
+
+        Every move is played once while loading, which takes the snapshots.
+
+        Args:
+            path: File written by ``MoveLogWriter``.
+            interval: Moves between snapshots (see ``__init__``).
+
+        Returns:
+            A ``History``. Moves after a damaged chunk or an illegal move
+            are left out.
+
+        Raises:
+            ValueError: If the file is not a move log or its header is damaged.
+        """
+        with MoveLog.load(path) as log:
+            board = log.board()
+            history = cls(board, interval)
+            history.mark()
+            for _ in log.play(board):
+                history.mark()
+        return history
+
+    def __len__(self):
+        """Returns the number of moves in the history, undone ones included."""
+        return len(self.board.moves_stack) + len(self.board.redo_stack)
+
+    @property
+    def position(self):
+        """Number of moves currently made."""
+        return len(self.board.moves_stack)
+
+    def seek(self, position):
+        """Moves the board to ``position`` moves into its history.
+
+        Args:
+            position: Number of moves, from 0 to ``len(history)``.
+
+        Raises:
+            IndexError: If ``position`` is outside the history.
+        """
+        board = self.board
+        if not 0 <= position <= len(self):
+            raise IndexError("position %d outside the move history" % position)
+        if board.moves_stack is not self._stack:
+            self._checkpoints.clear()  # The board was scrambled or rebuilt since
+            self._stack = board.moves_stack
+        # Start from wherever is closest: here, or the snapshot below or above
+        interval = self.interval
+        best = None
+        cost = abs(position - self.position)
+        for mark in (position // interval * interval, -(-position // interval) * interval):
+            if abs(position - mark) < cost and self._valid(mark):
+                best, cost = mark, abs(position - mark)
+        if best is not None:
+            self._jump(best)
+        while self.position < position:
+            board.redo()
+            self.mark()
+        while self.position > position:
+            board.undo()
+            self.mark()
+
+    def _move_at(self, position):
+        """Returns the move that took the history from ``position - 1`` to ``position``."""
+        board = self.board
+        done = len(board.moves_stack)
+        if position <= done:
+            return board.moves_stack[position - 1]
+        return board.redo_stack[done - position]
+
+    def _valid(self, mark):
+        """Checks that the snapshot at ``mark`` exists and still belongs to the history."""
+        checkpoint = self._checkpoints.get(mark)
+        if checkpoint is None or mark > len(self):
+            return False
+        # Moves are never reused, so the same move object means the same line of play
+        return mark == 0 or self._move_at(mark) is checkpoint[1]
+
+    def mark(self):
+        """Takes a snapshot if the board stands on a multiple of ``interval`` without one.
+
+        Call it after every move, undo or redo made on the board; it is O(1)
+        except on the moves that take a snapshot.
+        """
+        position = len(self.board.moves_stack)
+        if position % self.interval == 0:
+            if self.board.moves_stack is not self._stack:
+                self._checkpoints.clear()
+                self._stack = self.board.moves_stack
+            if not self._valid(position):
+                self._checkpoints[position] = (self.board.snapshot(),
+                                               self._move_at(position) if position else None)
+
+    def _jump(self, mark):
+        """Restores the snapshot at ``mark`` and shifts the moves between the two stacks."""
+        board = self.board
+        done, redo = board.moves_stack, board.redo_stack
+        board.restore(self._checkpoints[mark][0])
+        if mark < len(done):
+            redo.extend(reversed(done[mark:]))
+            del done[mark:]
+        elif mark > len(done):
+            count = mark - len(done)
+            done.extend(reversed(redo[-count:]))
+            del redo[-count:]
+
+
+def test_seek():
+    """Seeks through snapshots must land on the states rolling one move at a time reaches.
+
+    The history branches (new moves after undos) and is seeked while it is
+    played, so stale snapshots are met too. ``python -m pytest history.py``.
+    """
+    rng = random.Random(1)
+    cells = bytearray(Board(4, 4, True).cells)
+    cells[5] = cells[10] = BLANK  # Several blanks: their order must survive restore
+    board = Board.from_cells(4, 4, cells, None, True)
+    start = board.snapshot()
+    history = History(board, 16)
+    history.mark()
+    for _ in range(1500):
+        chance = rng.random()
+        if chance < 0.02:
+            history.seek(rng.randint(0, len(history)))
+        elif chance < 0.2 and board.moves_stack:
+            board.undo()
+            history.mark()
+        else:
+            board.move(*rng.choice(board.legal_moves()))  # Drops what was undone
+            history.mark()
+    line = board.moves_stack + board.redo_stack[::-1]
+    reference = Board.from_cells(4, 4, cells, None, True)
+    reference.redo_stack = line[::-1]
+    for position in [0, len(line)] + [rng.randint(0, len(line)) for _ in range(100)]:
+        history.seek(position)
+        reference.seek(position)
+        assert board.snapshot() == reference.snapshot()
+        assert board.moves_stack == line[:position]
+    history.seek(0)
+    assert board.snapshot() == start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the board at any move of a move log")
+    parser.add_argument("log", help="move log (.rclog)")
+    parser.add_argument("positions", type=int, nargs="+", help="move numbers to seek to")
+    parser.add_argument("--interval", type=int, help="moves between snapshots")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    history = History.from_log(args.log, args.interval)
+    print("%d moves loaded in %.2fs" % (len(history), time.perf_counter() - start))
+    for position in args.positions:
+        start = time.perf_counter()
+        history.seek(position)
+        board = history.board
+        print("move %d (%.2f ms): remaining %d, solved %s" % (
+            position, (time.perf_counter() - start) * 1000, board.remaining, board.is_solved()))
+        for row in board.to_level():
+            print(" ".join(top + face if top != " " else ".." for top, face in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Level packs: many boards in one file, loaded lazily through ``mmap``.
+
+Layout (little endian)::
+
+    header   magic, flags, level count, index offset
+    records  one per level: size_y, size_x, flags, cell codes, tile numbers
+    index    level count + 1 record offsets (the last one is the index itself)
+
+A record stores the cells as one byte each (orientation IDs, ``BLANK`` and
+``BLOCK``, so the ``X`` blocks are part of it), followed by the target
+tile numbers when they are not simply numbered row by row. Opening a pack
+only reads the header; ``board(n)`` reads record ``n`` through the index,
+so level 50,000 costs the same as level 1.
+
+    python levelpack.py levels.rcpack --from pack.jsonl
+    python levelpack.py levels.rcpack --generate 1000 --size 4 --depth 60
+"""
+
+import argparse
+import mmap
+import os
+import struct
+
+from board import Board
+from cubes import BLANK, BLOCK
+
+MAGIC = b"RCPAK\x01"
+HEADER = struct.Struct("<6sHIQ")  # magic, flags (none yet), level count, index offset
+RECORD = struct.Struct("<HHB")    # size_y, size_x, record flags
+OFFSET = struct.Struct("<Q")
+DIGIT_MODE = 1    # Record flag: the tile numbers count towards the solved state
+HAS_DIGITS = 2    # Record flag: tile numbers follow the cells
+WIDE_DIGITS = 4   # Record flag: tile numbers take four bytes instead of two
+EXTENSION = ".rcpack"
+
+
+def _digit_layout(board):
+    """Returns the tile numbers to store, or None when they are numbered row by row."""
+    nn = 1  # Tile number counter, as in ``Board._reindex``
+    for cell, code in enumerate(board.cells):
+        if code < BLANK:
+            if board.digits[cell] != nn:
+                return board.digits
+            nn += 1
+        elif board.digits[cell]:
+            return board.digits
+    return None
+
+
+def write_level_pack(path, boards):
+    """Writes boards as a level pack.
+
+    Args:
+        path: Output file name.
+        boards: Iterable of ``Board`` objects, in level order.
+
+    Returns:
+        The number of levels written.
+    """
+    tmp_path = path + ".tmp"
+    offsets = []
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0, 0))  # Rewritten once the index is known
+        for board in boards:
+            offsets.append(f.tell())
+            digits = _digit_layout(board)
+            flags = DIGIT_MODE if board.digit_mode else 0
+            if digits is not None:
+                flags |= HAS_DIGITS
+                if max(digits, default=0) > 0xFFFF:
+                    flags |= WIDE_DIGITS
+            f.write(RECORD.pack(board.size_y, board.size_x, flags))
+            f.write(bytes(board.cells))
+            if digits is not None:
+                f.write(struct.pack("<%d%s" % (len(digits), "I" if flags & WIDE_DIGITS else "H"),
+                                    *digits))
+        index = f.tell()
+        offsets.append(index)
+        f.write(struct.pack("<%dQ" % len(offsets), *offsets))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, 0, len(offsets) - 1, index))
+    os.replace(tmp_path, path)  # Never leave a half-written pack under the real name
+    return len(offsets) - 1
+
+
+class LevelPack:
+    """A level pack opened through ``mmap``.
+
+    Supports ``len(pack)`` and ``pack[n]`` (a new ``Board`` for level ``n``).
+    """
+
+    __slots__ = ("path", "_count", "_index", "_data", "_file")
+
+    @classmethod
+    def load(cls, path):
+        """Maps a level pack and checks its header.
+
+        Args:
+            path: File written by ``write_level_pack``.
+
+        Returns:
+            A ``LevelPack``; no level is read yet.
+
+        Raises:
+            ValueError: If the file is not a level pack, is truncated or has
+                no levels.
+        """
+        pack = cls.__new__(cls)
+        pack.path = path
+        pack._file = open(path, "rb")
+        try:
+            pack._data = mmap.mmap(pack._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            pack._file.close()
+            raise ValueError("%s: empty level pack file" % path)
+        try:
+            if len(pack._data) < HEADER.size:
+                raise ValueError("%s: truncated level pack header" % path)
+            magic, flags, pack._count, pack._index = HEADER.unpack_from(pack._data, 0)
+            if magic != MAGIC:
+                raise ValueError("%s: not a level pack file" % path)
+            if pack._count == 0:
+                raise ValueError("%s: level pack has no levels" % path)
+            if len(pack._data) < pack._index + OFFSET.size * (pack._count + 1):
+                raise ValueError("%s: truncated level pack index" % path)
+        except ValueError:
+            pack.close()
+            raise
+        return pack
+
+    def close(self):
+        """Unmaps the file."""
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, number):
+        return self.board(number)
+
+    def board(self, number):
+        """Reads one level.
+
+        Args:
+            number: Level number, from 0 (negative numbers count from the end).
+
+        Returns:
+            A new ``Board`` for the level.
+
+        Raises:
+            IndexError: If there is no such level.
+            ValueError: If the record is damaged.
+        """
+        if number < 0:
+            number += self._count
+        if not 0 <= number < self._count:
+            raise IndexError("level %d not in pack of %d" % (number, self._count))
+        data = self._data
+        start, end = struct.unpack_from("<2Q", data, self._index + number * OFFSET.size)
+        if not HEADER.size <= start <= end - RECORD.size or end > self._index:
+            raise ValueError("%s: damaged index entry for level %d" % (self.path, number))
+        size_y, size_x, flags = RECORD.unpack_from(data, start)
+        ncells = size_y * size_x
+        pos = start + RECORD.size
+        if not ncells:
+            raise ValueError("%s: damaged record for level %d" % (self.path, number))
+        digits = None
+        if flags & HAS_DIGITS:
+            width = 4 if flags & WIDE_DIGITS else 2
+            if end - pos != ncells * (1 + width):
+                raise ValueError("%s: damaged record for level %d" % (self.path, number))
+            digits = struct.unpack_from("<%d%s" % (ncells, "I" if width == 4 else "H"), data,
+                                        pos + ncells)
+        elif end - pos != ncells:
+            raise ValueError("%s: damaged record for level %d" % (self.path, number))
+        cells = data[pos:pos + ncells]
+        if max(cells) > BLOCK:
+            raise ValueError("%s: bad cell code %d in level %d" % (self.path, max(cells), number))
+        return Board.from_cells(size_y, size_x, cells, digits, bool(flags & DIGIT_MODE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Rolling Cubes level pack")
+    parser.add_argument("out", help="level pack to write (%s)" % EXTENSION)
+    parser.add_argument("--from", dest="source", help="JSON-lines pack to convert")
+    parser.add_argument("--generate", type=int, metavar="COUNT", help="number of scrambles")
+    parser.add_argument("--size", type=int, default=3, help="board side of generated levels")
+    parser.add_argument("--depth", type=int, default=30, help="scramble depth of generated levels")
+    parser.add_argument("--digits", action="store_true", help="generate digit-mode levels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.source:
+        from pack_solver import read_pack
+        boards = read_pack(args.source)
+    elif args.generate:
+        from scramble import scramble_pack
+        boards = scramble_pack(Board(args.size, args.size, args.digits), args.generate,
+                               args.depth, args.seed)
+    else:
+        parser.error("give --from or --generate")
+    print("%d levels written to %s" % (write_level_pack(args.out, boards), args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Compact binary move logs: recording, reading and headless replay.
+
+A log starts with a header holding the board the session started from and
+the seed that produced it, followed by chunks of moves. Every move is stored
+as a single code ``slot << 2 | (vek - 1)``, where ``slot`` is the position of
+the target blank in ``Board.blanks`` (a roll keeps the blank in its slot),
+so a move takes one byte on boards with up to 64 blanks and two otherwise.
+Moves, scrambles and restored snapshots leave ``blanks`` out of row order,
+so the header stores the order the slots refer to.
+
+Layout (little endian)::
+
+    header   magic, size_y, size_x, digit mode, bytes per move, seed
+    cells    size_y * size_x cell codes
+    digits   size_y * size_x uint32 tile numbers (digit mode only)
+    blanks   uint32 cell index of every blank, in ``Board.blanks`` order
+    crc32    of everything above
+    chunks   move count, crc32 of the moves, moves
+
+The recorder writes a chunk whenever its buffer fills up, so a crashed
+session loses at most one chunk; a reader stops at the first truncated or
+damaged chunk and reports why in ``error``.
+"""
+
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+from board import Board, neighbor_table
+from cubes import BLANK, DELTA, OPPOSITE, ROLL
+
+MAGIC = b"RCLOG\x02"
+# magic, size_y, size_x, digit mode, bytes per move, seed
+HEADER = struct.Struct("<6sHH?BQ")
+CHUNK = struct.Struct("<II")  # Moves in the chunk, crc32 of the moves
+CRC = struct.Struct("<I")
+CHUNK_MOVES = 4096  # Moves buffered before the recorder writes a chunk
+_DECODE = {}  # (size_y, size_x, bytes per move) -> move code decoding table
+
+
+class MoveLogWriter:
+    """Streams the moves of one session into a log file.
+
+    Attributes:
+        board: The ``Board`` being played; moves are recorded after it has
+            applied them.
+        seed: Seed stored in the header.
+        moves: Number of moves recorded so far.
+    """
+
+    __slots__ = ("board", "seed", "moves", "_file", "_width", "_buffer", "_chunk_moves")
+
+    def __init__(self, path, board, seed=0, chunk_moves=CHUNK_MOVES):
+        """Creates the log and writes its header.
+
+        Args:
+            path: Output file name; an existing file is overwritten.
+            board: The ``Board`` in its starting state.
+            seed: Seed of the scramble (or level generator) that made the board.
+            chunk_moves: Moves per chunk.
+
+        Raises:
+            ValueError: If the board has more blanks than a move code can address.
+        """
+        if len(board.blanks) > 1 << 14:
+            raise ValueError("too many blanks for a move log: %d" % len(board.blanks))
+        self.board = board
+        self.seed = seed
+        self.moves = 0
+        self._width = 1 if len(board.blanks) <= 1 << 6 else 2
+        self._buffer = bytearray() if self._width == 1 else array("H")
+        self._chunk_moves = chunk_moves
+        head = HEADER.pack(MAGIC, board.size_y, board.size_x, board.digit_mode, self._width, seed)
+        head += bytes(board.cells)
+        if board.digit_mode:
+            head += _little_endian(array("I", board.digits)).tobytes()
+        head += _little_endian(array("I", board.blanks)).tobytes()
+        self._file = open(path, "wb")
+        self._file.write(head + CRC.pack(zlib.crc32(head)))
+
+    def record(self, move):
+        """Appends a move returned by ``Board.move``, ``roll`` or ``click``."""
+        board = self.board
+        vek, nyp, nxp = move
+        dy, dx = DELTA[vek]
+        src = (nyp - dy) * board.size_x + nxp - dx  # Now the blank the cube left behind
+        blanks = board.blanks
+        slot = blanks.index(src) if len(blanks) > 1 else 0
+        self._buffer.append(slot << 2 | (vek - 1))
+        self.moves += 1
+        if len(self._buffer) >= self._chunk_moves:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._buffer:
+            return
+        data = self._buffer if self._width == 1 else _little_endian(self._buffer).tobytes()
+        self._file.write(CHUNK.pack(len(self._buffer), zlib.crc32(data)))
+        self._file.write(data)
+        del self._buffer[:]
+
+    def flush(self):
+        """Writes the buffered moves as a (possibly short) chunk and flushes the file."""
+        self._write_chunk()
+        self._file.flush()
+
+    def close(self):
+        """Flushes and closes the log."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MoveLog:
+    """A move log opened for reading through ``mmap``.
+
+    Attributes:
+        size_y: Number of rows on the board.
+        size_x: Number of columns on the board.
+        digit_mode: Whether the tile numbers count towards the solved state.
+        seed: Seed stored by the recorder.
+        width: Bytes per move.
+        error: Why reading stopped early, or None if every chunk was intact.
+    """
+
+    __slots__ = ("size_y", "size_x", "digit_mode", "seed", "width", "error",
+                 "_cells", "_digits", "_blanks", "_start", "_data", "_file")
+
+    @classmethod
+    def load(cls, path):
+        """Opens a log and checks its header.
+
+        Args:
+            path: File written by ``MoveLogWriter``.
+
+        Returns:
+            A ``MoveLog`` reading straight from the mapped file.
+
+        Raises:
+            ValueError: If the file is not a move log or its header is damaged.
+        """
+        log = cls.__new__(cls)
+        log.error = None
+        log._file = open(path, "rb")
+        try:
+            log._data = mmap.mmap(log._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            log._file.close()
+            raise ValueError("%s: empty move log file" % path)
+        try:
+            log._parse(path)
+        except (ValueError, struct.error):
+            log.close()
+            raise
+        return log
+
+    def _parse(self, path):
+        data = self._data
+        if len(data) < HEADER.size:
+            raise ValueError("%s: truncated move log header" % path)
+        magic, self.size_y, self.size_x, self.digit_mode, self.width, self.seed = \
+            HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s: not a move log file" % path)
+        if self.width not in (1, 2):
+            raise ValueError("%s: bad move size %d" % (path, self.width))
+        ncells = self.size_y * self.size_x
+        pos = HEADER.size
+        self._cells = bytes(data[pos:pos + ncells])
+        nblanks = self._cells.count(BLANK)
+        if len(data) < pos + ncells * (5 if self.digit_mode else 1) + 4 * nblanks + CRC.size:
+            raise ValueError("%s: truncated move log header" % path)
+        pos += ncells
+        self._digits = None
+        if self.digit_mode:
+            self._digits = array("I", data[pos:pos + 4 * ncells])
+            pos += 4 * ncells
+            self._digits = _little_endian(self._digits)
+        self._blanks = _little_endian(array("I", data[pos:pos + 4 * nblanks])).tolist()
+        pos += 4 * nblanks
+        if CRC.unpack_from(data, pos)[0] != zlib.crc32(data[:pos]):
+            raise ValueError("%s: damaged move log header" % path)
+        if sorted(self._blanks) != [cell for cell, code in enumerate(self._cells) if code == BLANK]:
+            raise ValueError("%s: damaged move log header" % path)
+        self._start = pos + CRC.size
+
+    def close(self):
+        """Unmaps the file."""
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def board(self):
+        """Returns a new ``Board`` in the state the session started from."""
+        board = Board.from_cells(self.size_y, self.size_x, self._cells, self._digits,
+                                 self.digit_mode)
+        board.blanks[:] = self._blanks  # The slot order the move codes refer to
+        return board
+
+    def chunks(self):
+        """Yields the move codes of every intact chunk, one sequence per chunk.
+
+        Reading stops at the first truncated or damaged chunk, after setting
+        ``error``.
+        """
+        data = self._data
+        pos = self._start
+        end = len(data)
+        while pos < end:
+            if end - pos < CHUNK.size:
+                self.error = "truncated chunk header at byte %d" % pos
+                return
+            count, crc = CHUNK.unpack_from(data, pos)
+            size = count * self.width
+            if end - pos - CHUNK.size < size:
+                self.error = "truncated chunk at byte %d" % pos
+                return
+            moves = data[pos + CHUNK.size:pos + CHUNK.size + size]
+            if zlib.crc32(moves) != crc:
+                self.error = "damaged chunk at byte %d" % pos
+                return
+            pos += CHUNK.size + size
+            yield moves if self.width == 1 else _little_endian(array("H", moves))
+
+    def __iter__(self):
+        """Yields the move codes of the log in order."""
+        for codes in self.chunks():
+            yield from codes
+
+    def play(self, board):
+        """Makes the logged moves on a board, one at a time, through ``Board.move``.
+
+        Args:
+            board: A board in the starting state, usually from ``board()``.
+
+        Yields:
+            Each ``[vek, nyp, nxp]`` move once it is made. Playing stops at
+            the first damaged chunk or illegal move, after setting ``error``.
+        """
+        decode = _decode_table(self.size_y, self.size_x, self.width)
+        blanks = board.blanks
+        size_x = self.size_x
+        for moves, code in enumerate(self):
+            slot, vek, sources = decode[code]
+            if slot >= len(blanks):
+                self.error = "illegal move %d: no blank %d" % (moves, slot)
+                return
+            src = sources[blanks[slot]]
+            move = board.move(src // size_x, src % size_x, vek) if src >= 0 else None
+            if move is None:
+                self.error = "illegal move %d: nothing rolls into cell %d" % (moves, blanks[slot])
+                return
+            yield move
+
+
+class ReplayResult:
+    """Outcome of ``replay``.
+
+    Attributes:
+        board: The board after the last replayed move.
+        moves: Number of moves replayed.
+        solved: Whether the final board is solved.
+        seed: Seed stored in the log.
+        error: Why the replay stopped early (truncated or damaged file,
+            illegal move), or None if the whole log was replayed.
+    """
+
+    __slots__ = ("board", "moves", "solved", "seed", "error")
+
+    def __init__(self, board, moves, seed, error):
+        self.board = board
+        self.moves = moves
+        self.solved = board.is_solved()
+        self.seed = seed
+        self.error = error
+
+    @property
+    def complete(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "ReplayResult(moves=%d, solved=%s, error=%r)" % (self.moves, self.solved, self.error)
+
+
+def replay(path):
+    """Re-applies a move log headlessly and checks the final state.
+
+    The moves are applied straight to the cell arrays, without the move
+    history and key upkeep of ``Board.move``, and every move is checked for
+    legality on the way.
+
+    Args:
+        path: File written by ``MoveLogWriter``.
+
+    Returns:
+        A ``ReplayResult``; damaged or truncated logs are replayed up to the
+        last intact chunk.
+
+    Raises:
+        ValueError: If the file is not a move log or its header is damaged.
+    """
+    with MoveLog.load(path) as log:
+        start = log.board()
+        cells = start.cells
+        digits = start.digits
+        blanks = start.blanks
+        nblanks = len(blanks)
+        decode = _decode_table(log.size_y, log.size_x, log.width)
+        moves = 0
+        error = None
+        for codes in log.chunks():
+            for code in codes:
+                slot, vek, sources = decode[code]
+                if slot >= nblanks:
+                    error = "illegal move %d: no blank %d" % (moves, slot)
+                    break
+                dst = blanks[slot]
+                src = sources[dst]
+                if src < 0 or cells[src] >= BLANK:
+                    error = "illegal move %d: nothing rolls into cell %d" % (moves, dst)
+                    break
+                cells[dst] = ROLL[cells[src]][vek]
+                cells[src] = BLANK
+                digits[dst] = digits[src]
+                digits[src] = 0
+                blanks[slot] = src
+                moves += 1
+            if error:
+                break
+        board = Board.from_cells(log.size_y, log.size_x, cells, digits, log.digit_mode)
+        board.moves = moves
+        return ReplayResult(board, moves, log.seed, error or log.error)
+
+
+def _decode_table(size_y, size_x, width):
+    """Move code -> (blank slot, direction, source cell of every blank cell), cached per size."""
+    key = (size_y, size_x, width)
+    table = _DECODE.get(key)
+    if table is None:
+        nxt = neighbor_table(size_y, size_x)
+        back = [nxt[OPPOSITE[vek]] if vek else () for vek in range(5)]
+        table = _DECODE[key] = [(code >> 2, (code & 3) + 1, back[(code & 3) + 1])
+                                for code in range(1 << 8 * width)]
+    return table
+
+
+def _little_endian(values):
+    """Byte-swaps an array in place on big-endian machines and returns it."""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -0,0 +1,215 @@
+"""Parallel solving of level packs.
+
+Puzzles are spread over a ``ProcessPoolExecutor``, each with its own node
+and time budget, and their results are streamed out as they complete. The
+results file is the checkpoint: every finished puzzle is appended as one
+JSON line and flushed, so a run that is interrupted picks up where it
+stopped when started again with the same output file.
+
+Pattern databases are built once by the parent and opened with ``mmap`` by
+every worker, so the large tables live once in the page cache instead of
+once per process; the small per-cube tables are cached inside each worker
+per board geometry.
+
+A pack is a JSON-lines file with one level per line:
+
+    {"level": [[["W", "B"], [" ", " "], ...], ...], "level_digit": [["1", "0", ...], ...],
+     "digit_mode": false}
+
+where ``level`` and ``level_digit`` are what ``init_level`` and
+``init_level_digit`` make (``level_digit`` may be left out). Binary level
+packs (``levelpack.py``) are read as well.
+
+    python pack_solver.py pack.jsonl --out results.jsonl --time-limit 10
+    python pack_solver.py pack.jsonl --generate 1000 --size 3 --depth 40
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from board import Board
+from levelpack import EXTENSION, LevelPack
+from pattern_db import PatternDB, load_or_build, pattern_db_path
+from scramble import scramble_pack
+from solver import heuristic_tables, solve_board, table_key
+
+IN_FLIGHT = 4  # Puzzles queued per worker, so results stream without flooding the pool
+
+_worker_pdbs = {}    # Path -> PatternDB, opened once per worker
+_worker_tables = {}  # Board geometry -> heuristic tables, built once per worker
+
+
+def read_pack(path):
+    """Yields the boards of a JSON-lines or binary level pack."""
+    if path.endswith(EXTENSION):
+        with LevelPack.load(path) as pack:
+            for number in range(len(pack)):
+                yield pack.board(number)
+        return
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield Board.from_level(entry["level"], entry.get("level_digit"),
+                                       entry.get("digit_mode", False))
+
+
+def write_pack(path, boards):
+    """Writes boards as a JSON-lines level pack."""
+    with open(path, "w") as f:
+        for board in boards:
+            f.write(json.dumps({"level": board.to_level(), "level_digit": board.to_level_digit(),
+                                "digit_mode": board.digit_mode}) + "\n")
+
+
+def _pdb_groups(board, tiles):
+    """Tile groups to build pattern databases for: consecutive tiles in digit mode."""
+    if tiles <= 0:
+        return []
+    if not board.digit_mode:
+        return [tuple(range(1, tiles + 1))]
+    count = max(board.digits, default=0)
+    return [tuple(range(first, first + tiles)) for first in range(1, count - tiles + 2, tiles)]
+
+
+def _solve_one(job):
+    """Worker: solves one puzzle and returns its result record."""
+    index, size_y, size_x, cells, digits, digit_mode, pdb_paths, options = job
+    board = Board.from_cells(size_y, size_x, cells, digits, digit_mode)
+    geometry = table_key(board)
+    tables = _worker_tables.get(geometry)
+    if tables is None:
+        tables = _worker_tables[geometry] = heuristic_tables(board)
+    pdbs = []
+    for path in pdb_paths:
+        pdb = _worker_pdbs.get(path)
+        if pdb is None:
+            pdb = _worker_pdbs[path] = PatternDB.load(path)
+        pdbs.append(pdb)
+    result = solve_board(board, options["max_depth"], tables, pdbs,
+                         max_nodes=options["max_nodes"], time_limit=options["time_limit"])
+    if result.moves is not None:
+        status = "solved"
+    else:
+        status = result.budget or "unsolvable"
+    return {"index": index, "status": status,
+            "length": len(result.moves) if result.moves is not None else None,
+            "moves": result.moves, "nodes": result.nodes, "seconds": round(result.seconds, 4)}
+
+
+def done_indices(path):
+    """Reads the indices already in a results file (a torn last line is ignored)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["index"])
+            except (ValueError, KeyError):
+                pass  # Cut off by the interruption
+    return done
+
+
+def solve_pack(boards, workers=None, max_depth=80, max_nodes=None, time_limit=None,
+               pdb_dir=None, pdb_tiles=0, skip=()):
+    """Solves a pack of boards in parallel.
+
+    Args:
+        boards: Iterable of ``Board`` objects; their position is their index.
+        workers: Worker processes (default: one per CPU).
+        max_depth: Longest solution searched for.
+        max_nodes: Node budget per puzzle.
+        time_limit: Time budget per puzzle, in seconds.
+        pdb_dir: Directory of pattern database files, built there when
+            missing; None for no pattern databases.
+        pdb_tiles: Cubes tracked per pattern database.
+        skip: Indices not to solve (already done).
+
+    Yields:
+        One result dict per puzzle, in completion order: ``index``,
+        ``status`` (``"solved"``, ``"unsolvable"`` within ``max_depth``,
+        ``"nodes"`` or ``"time"`` when a budget ran out), ``length``,
+        ``moves``, ``nodes`` and ``seconds``.
+    """
+    options = {"max_depth": max_depth, "max_nodes": max_nodes, "time_limit": time_limit}
+    workers = workers or os.cpu_count() or 1
+    skip = set(skip)
+    pdb_paths = {}  # Geometry (and tile groups) -> pattern database files
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for index, board in enumerate(boards):
+            if index in skip:
+                continue
+            paths = ()
+            if pdb_dir and pdb_tiles > 0:
+                groups = tuple(_pdb_groups(board, pdb_tiles))
+                key = table_key(board) + groups
+                paths = pdb_paths.get(key)
+                if paths is None:
+                    # Built here, before any worker needs them, then shared through mmap
+                    for tiles in groups:
+                        load_or_build(pdb_dir, board, tiles).close()
+                    paths = pdb_paths[key] = tuple(pattern_db_path(pdb_dir, board, tiles)
+                                                   for tiles in groups)
+            job = (index, board.size_y, board.size_x, bytes(board.cells), list(board.digits),
+                   board.digit_mode, paths, options)
+            pending.add(pool.submit(_solve_one, job))
+            if len(pending) >= workers * IN_FLIGHT:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a level pack in parallel")
+    parser.add_argument("pack", help="JSON-lines or binary (%s) level pack" % EXTENSION)
+    parser.add_argument("--out", help="results file, also the checkpoint (default: <pack>.results)")
+    parser.add_argument("--restart", action="store_true", help="ignore earlier results")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--max-depth", type=int, default=80)
+    parser.add_argument("--max-nodes", type=int)
+    parser.add_argument("--time-limit", type=float, help="seconds per puzzle")
+    parser.add_argument("--pdb-dir", help="pattern database directory")
+    parser.add_argument("--pdb-tiles", type=int, default=2, help="cubes per pattern database")
+    parser.add_argument("--generate", type=int, metavar="COUNT",
+                        help="write a pack of scrambles instead of solving one")
+    parser.add_argument("--size", type=int, default=3, help="board side of generated puzzles")
+    parser.add_argument("--depth", type=int, default=30, help="scramble depth of generated puzzles")
+    parser.add_argument("--digits", action="store_true", help="generate digit-mode puzzles")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        write_pack(args.pack, scramble_pack(Board(args.size, args.size, args.digits),
+                                            args.generate, args.depth, args.seed))
+        return
+
+    out = args.out or args.pack + ".results"
+    if args.restart and os.path.exists(out):
+        os.remove(out)
+    done = done_indices(out)
+    solved = total = 0
+    with open(out, "a") as f:
+        for record in solve_pack(read_pack(args.pack), args.workers, args.max_depth,
+                                 args.max_nodes, args.time_limit, args.pdb_dir,
+                                 args.pdb_tiles if args.pdb_dir else 0, done):
+            f.write(json.dumps(record) + "\n")
+            f.flush()  # Checkpoint
+            total += 1
+            solved += record["status"] == "solved"
+            print("%6d  %-10s length=%-4s nodes=%-10d %.2fs" % (
+                record["index"], record["status"], record["length"], record["nodes"],
+                record["seconds"]), file=sys.stderr)
+    print("%d solved of %d this run (%d done before)" % (solved, total, len(done)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
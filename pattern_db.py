@@ -0,0 +1,329 @@
+"""Disk-backed pattern databases for the solver heuristic.
+
+A pattern database stores, for an abstraction of the board that keeps the
+blank cells and a few tracked cubes (cell and orientation) and forgets every
+other cube, the number of rolls of the tracked cubes needed to solve them.
+The tables are built once with a retrograde breadth-first search, written as
+nibble-packed files and loaded through ``mmap``, so that all solver processes
+on a machine share one copy in the page cache.
+
+Moves of untracked cubes cost nothing in the abstraction, which makes the
+values of databases over disjoint sets of cubes additive.
+"""
+
+import mmap
+import os
+import struct
+from collections import deque
+from itertools import combinations
+
+from board import neighbor_table
+from cubes import BLOCK, DIRECTIONS, OPPOSITE, ROLL, SOLVED_ORIENT
+
+MAGIC = b"RCPDB\x01"
+# magic, size_y, size_x, blanks, tracked cubes, digit mode, data offset, entries
+HEADER = struct.Struct("<6sHHBB?xIQ")
+UNKNOWN = 15  # Nibble value of an unreachable or impossible abstract state
+MAX_VALUE = UNKNOWN - 1  # Larger distances are stored capped, which stays admissible
+
+
+class PatternDB:
+    """A memory-mapped pattern database.
+
+    Attributes:
+        size_y: Number of rows of the boards it applies to.
+        size_x: Number of columns of the boards it applies to.
+        blocked: Flat indices of the ``X`` cells.
+        blanks: Number of blank cells.
+        tiles: Tracked tile numbers; in digit mode the table is only valid
+            for these tiles, otherwise any ``len(tiles)`` cubes can use it.
+        digit_mode: Whether the tile numbers must be in order too.
+    """
+
+    __slots__ = ("size_y", "size_x", "blocked", "blanks", "tiles", "digit_mode",
+                 "_data", "_offset", "_entries", "_blank_rank", "_file")
+
+    @classmethod
+    def load(cls, path):
+        """Maps a pattern database file into memory.
+
+        Args:
+            path: File written by ``build_pattern_db``.
+
+        Returns:
+            A ``PatternDB`` reading straight from the mapped file.
+
+        Raises:
+            ValueError: If the file is not a pattern database or is truncated.
+        """
+        pdb = cls.__new__(cls)
+        pdb._file = open(path, "rb")
+        try:
+            pdb._data = mmap.mmap(pdb._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            pdb._file.close()
+            raise ValueError("%s: empty pattern database file" % path)
+        try:
+            pdb._parse(path)
+        except (ValueError, struct.error):
+            pdb.close()
+            raise
+        return pdb
+
+    def _parse(self, path):
+        data = self._data
+        (magic, self.size_y, self.size_x, self.blanks, tracked, self.digit_mode,
+         self._offset, self._entries) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s: not a pattern database file" % path)
+        ncells = self.size_y * self.size_x
+        pos = HEADER.size
+        self.blocked = tuple(cell for cell in range(ncells) if data[pos + cell])
+        pos += ncells
+        self.tiles = struct.unpack_from("<%dH" % tracked, data, pos)
+        if len(data) < self._offset + (self._entries + 1) // 2:
+            raise ValueError("%s: truncated pattern database file" % path)
+        self._blank_rank = _blank_ranks(self._open_cells(), self.blanks)
+
+    def _open_cells(self):
+        blocked = set(self.blocked)
+        return [cell for cell in range(self.size_y * self.size_x) if cell not in blocked]
+
+    def close(self):
+        """Unmaps the file."""
+        self._data.close()
+        self._file.close()
+
+    def matches(self, board):
+        """Checks whether the database applies to a board's geometry."""
+        return (board.size_y == self.size_y and board.size_x == self.size_x
+                and len(board.blanks) == self.blanks and board.digit_mode == self.digit_mode
+                and self.blocked == tuple(cell for cell, code in enumerate(board.cells)
+                                          if code == BLOCK))
+
+    def value(self, blanks, where, cells, tiles):
+        """Looks up the number of rolls the tracked cubes need.
+
+        Args:
+            blanks: Flat indices of the blank cells.
+            where: Maps a tile number to the flat index of its cell.
+            cells: Cell codes of the board.
+            tiles: Tile numbers of the cubes to use for the tracked slots.
+
+        Returns:
+            A lower bound on the rolls of these cubes needed to solve them;
+            ``UNKNOWN`` when the abstract state can never be solved.
+        """
+        if len(blanks) == 1:
+            index = self._blank_rank[blanks[0]]
+        else:
+            index = self._blank_rank[tuple(sorted(blanks))]
+        span = len(cells) * 24
+        for tile in tiles:
+            cell = where[tile]
+            index = index * span + cell * 24 + cells[cell]
+        byte = self._data[self._offset + (index >> 1)]
+        return (byte >> 4) if index & 1 else (byte & 15)
+
+
+def _blank_ranks(open_cells, blanks):
+    """Numbers the possible sets of blank cells (a cell when there is only one)."""
+    if blanks == 1:
+        return {cell: nn for nn, cell in enumerate(open_cells)}
+    return {combo: nn for nn, combo in enumerate(combinations(open_cells, blanks))}
+
+
+def pattern_db_path(directory, board, tiles):
+    """Returns the conventional file name of a database in ``directory``.
+
+    Without digit mode only the number of tracked cubes matters, so boards
+    of the same geometry share one file.
+    """
+    blocked = "".join("x" if code == BLOCK else "." for code in board.cells)
+    if board.digit_mode:
+        tracked = "d" + "-".join(str(tile) for tile in tiles)
+    else:
+        tracked = "k%d" % len(tiles)
+    name = "pdb_%dx%d_b%d_%s_%s.bin" % (board.size_y, board.size_x, len(board.blanks),
+                                        blocked, tracked)
+    return os.path.join(directory, name)
+
+
+def build_pattern_db(board, tiles, path):
+    """Builds a pattern database and writes it to ``path``.
+
+    The search starts from every abstract solved state and walks the rolls
+    backwards (each roll has an exact inverse); rolls of the tracked cubes
+    cost one and moves of the forgotten cubes cost nothing.
+
+    Args:
+        board: Any board with the wanted size, blocked cells, number of
+            blanks and digit mode; the cube positions do not matter.
+        tiles: Tile numbers of the tracked cubes. Two cubes give tables of
+            about a megabyte on 4x4 boards; each extra cube multiplies the
+            size by ``24 * cells``.
+        path: Output file name.
+
+    Returns:
+        The new database, loaded from ``path``.
+    """
+    tiles = tuple(tiles)
+    ncells = len(board.cells)
+    span = ncells * 24
+    tracked = len(tiles)
+    blocked_mask = bytes(1 if code == BLOCK else 0 for code in board.cells)
+    open_cells = [cell for cell in range(ncells) if not blocked_mask[cell]]
+    blank_count = len(board.blanks)
+    blank_sets = list(combinations(open_cells, blank_count))
+    rank_of = {rank: nn for nn, rank in enumerate(open_cells)}
+    entries = len(blank_sets) * span ** tracked
+    nxt = neighbor_table(board.size_y, board.size_x)
+    back = [nxt[OPPOSITE[vek]] if vek else () for vek in range(5)]
+
+    def encode(blank_index, cubes):
+        index = blank_index
+        for cell, orient in cubes:
+            index = index * span + cell * 24 + orient
+        return index
+
+    def decode(index):
+        cubes = []
+        for _ in range(tracked):
+            index, part = divmod(index, span)
+            cubes.append(divmod(part, 24))
+        cubes.reverse()
+        return index, cubes
+
+    def is_goal(blank_set, cubes):
+        for slot, (cell, orient) in enumerate(cubes):
+            if not SOLVED_ORIENT[orient]:
+                return False
+            if board.digit_mode:
+                # Tile k must have exactly k - 1 tiles before it in row order
+                rank = rank_of[cell]
+                before = sum(1 for blank in blank_set if rank_of[blank] < rank)
+                if rank - before != tiles[slot] - 1:
+                    return False
+        return True
+
+    # Seed the search with every abstract solved state
+    dist = bytearray([255]) * entries
+    queue = deque()
+    placements = [(cell, orient) for cell in open_cells for orient in range(24)
+                  if SOLVED_ORIENT[orient]]
+    for blank_index, blank_set in enumerate(blank_sets):
+        free = [pair for pair in placements if pair[0] not in blank_set]
+        for cubes in _distinct_cells(free, tracked):
+            if is_goal(blank_set, cubes):
+                index = encode(blank_index, cubes)
+                dist[index] = 0
+                queue.append(index)
+
+    blank_index_of = {blank_set: nn for nn, blank_set in enumerate(blank_sets)}
+    while queue:
+        index = queue.popleft()
+        d = dist[index]
+        blank_index, cubes = decode(index)
+        blank_set = blank_sets[blank_index]
+        occupied = {cell: slot for slot, (cell, orient) in enumerate(cubes)}
+        for nb, blank in enumerate(blank_set):
+            for vek in DIRECTIONS:
+                src = back[vek][blank]
+                if src < 0 or blocked_mask[src] or src in blank_set:
+                    continue
+                moved = list(blank_set)
+                moved[nb] = src
+                new_blanks = blank_index_of[tuple(sorted(moved))]
+                slot = occupied.get(src)
+                if slot is None:
+                    # A forgotten cube rolls into the blank: free move
+                    new_index = encode(new_blanks, cubes)
+                    new_d = d
+                else:
+                    new_cubes = list(cubes)
+                    new_cubes[slot] = (blank, ROLL[cubes[slot][1]][vek])
+                    new_index = encode(new_blanks, new_cubes)
+                    new_d = d + 1
+                if new_d < dist[new_index]:
+                    dist[new_index] = new_d
+                    if new_d == d:
+                        queue.appendleft(new_index)
+                    else:
+                        queue.append(new_index)
+
+    # Pack two entries per byte, low nibble first
+    packed = bytearray((entries + 1) // 2)
+    for index in range(entries):
+        d = dist[index]
+        nibble = UNKNOWN if d == 255 else min(d, MAX_VALUE)
+        if index & 1:
+            packed[index >> 1] |= nibble << 4
+        else:
+            packed[index >> 1] = nibble
+
+    offset = HEADER.size + ncells + 2 * tracked
+    offset = (offset + 15) & ~15  # Align the table
+    header = HEADER.pack(MAGIC, board.size_y, board.size_x, blank_count, tracked,
+                         board.digit_mode, offset, entries)
+    header += blocked_mask + struct.pack("<%dH" % tracked, *tiles)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(offset, b"\0"))
+        f.write(packed)
+    os.replace(tmp_path, path)  # Never leave a half-written table under the real name
+    return PatternDB.load(path)
+
+
+def _distinct_cells(placements, count):
+    """Yields ordered tuples of ``count`` placements on pairwise different cells."""
+    if count == 0:
+        yield ()
+        return
+    for pair in placements:
+        rest = [other for other in placements if other[0] != pair[0]]
+        for tail in _distinct_cells(rest, count - 1):
+            yield (pair,) + tail
+
+
+def load_or_build(directory, board, tiles):
+    """Loads the database for ``board``/``tiles`` from ``directory``, building it if missing."""
+    path = pattern_db_path(directory, board, tiles)
+    if os.path.exists(path):
+        return PatternDB.load(path)
+    os.makedirs(directory, exist_ok=True)
+    return build_pattern_db(board, tiles, path)
+
+
+def cover(board, pdbs):
+    """Assigns the board's cubes to pattern databases.
+
+    Args:
+        board: The board to solve.
+        pdbs: Loaded databases matching the board.
+
+    Returns:
+        A list of ``(pdb, tiles)`` groups over disjoint cubes. In digit mode
+        each database covers its own tiles; otherwise the databases are
+        reused, round robin, over consecutive tile numbers.
+    """
+    pdbs = [pdb for pdb in pdbs if pdb.matches(board)]
+    groups = []
+    if board.digit_mode:
+        used = set()
+        for pdb in pdbs:
+            if used.isdisjoint(pdb.tiles):
+                used.update(pdb.tiles)
+                groups.append((pdb, pdb.tiles))
+        return groups
+    tile = 1
+    last = max(board.digits, default=0)
+    nn = 0
+    while pdbs:
+        pdb = pdbs[nn % len(pdbs)]
+        size = len(pdb.tiles)
+        if tile + size - 1 > last:
+            break
+        groups.append((pdb, tuple(range(tile, tile + size))))
+        tile += size
+        nn += 1
+    return groups
@@ -0,0 +1,174 @@
+"""Per-frame phase timing for the game loop.
+
+``main()`` calls ``mark(phase)`` after each phase of a frame (waiting for
+input, handling it, drawing, the solved check, the panel, ``display.update``)
+and ``end_frame`` once the frame is on screen. The profiler keeps the last
+``window`` frames, rolling log2 latency histograms per phase and per-frame
+counters (blits, polygons), and writes them as a Chrome trace
+(``chrome://tracing``, Perfetto, speedscope) with ``dump``.
+
+When profiling is off ``main()`` holds None instead of a profiler, so the
+only cost left is a truth test per phase.
+"""
+
+import json
+import time
+from collections import deque
+
+BUCKETS = 24  # Histogram bucket i counts durations in [2**(i - 1), 2**i) microseconds
+OVERLAY_INTERVAL = 0.5  # Seconds between refreshes of the overlay text
+
+
+def _bucket(seconds):
+    """Returns the histogram bucket of a duration."""
+    return min(int(seconds * 1e6).bit_length(), BUCKETS - 1)
+
+
+class FrameProfiler:
+    """Collects phase timings and counters of the last ``window`` frames.
+
+    Attributes:
+        window: Number of frames kept.
+        histograms: Phase name -> list of ``BUCKETS`` frame counts over the
+            kept frames.
+        frames: Number of frames recorded since the start.
+    """
+
+    __slots__ = ("window", "histograms", "frames", "_frames", "_origin", "_start", "_last",
+                 "_current", "_overlay", "_overlay_time")
+
+    def __init__(self, window=2000):
+        """Creates an empty profiler.
+
+        Args:
+            window: Number of frames kept for the histograms and the trace.
+        """
+        self.window = window
+        self.histograms = {}
+        self.frames = 0
+        self._frames = deque()  # (start, [(phase, start, seconds)], counters)
+        self._origin = time.perf_counter()
+        self._start = self._last = self._origin
+        self._current = []
+        self._overlay = []
+        self._overlay_time = 0.0
+
+    def start_frame(self):
+        """Starts timing a frame, dropping the marks of an unfinished one."""
+        self._start = self._last = time.perf_counter()
+        self._current = []
+
+    def mark(self, phase):
+        """Ends a phase: the time since the previous mark is charged to ``phase``."""
+        now = time.perf_counter()
+        self._current.append((phase, self._last, now - self._last))
+        self._last = now
+
+    def end_frame(self, **counters):
+        """Records the frame.
+
+        Args:
+            counters: Per-frame counts to keep with the frame, such as
+                ``blits`` or ``polygons``.
+        """
+        frame = (self._start, self._current, counters)
+        self._current = []
+        self._frames.append(frame)
+        self.frames += 1
+        for phase, start, seconds in frame[1]:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = [0] * BUCKETS
+            histogram[_bucket(seconds)] += 1
+        if len(self._frames) > self.window:
+            # Roll the oldest frame out of the histograms
+            for phase, start, seconds in self._frames.popleft()[1]:
+                self.histograms[phase][_bucket(seconds)] -= 1
+
+    def durations(self, phase):
+        """Returns the durations (seconds) of a phase over the kept frames, summed per frame."""
+        result = []
+        for frame in self._frames:
+            total = None
+            for name, start, seconds in frame[1]:
+                if name == phase:
+                    total = (total or 0.0) + seconds
+            if total is not None:
+                result.append(total)
+        return result
+
+    def summary(self):
+        """Returns phase name -> dict with ``count``, ``mean_ms``, ``p50_ms``, ``p95_ms`` and ``max_ms``."""
+        result = {}
+        for phase in self.histograms:
+            values = sorted(self.durations(phase))
+            if not values:
+                continue
+            result[phase] = {
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": values[len(values) // 2] * 1000,
+                "p95_ms": values[min(len(values) - 1, len(values) * 95 // 100)] * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        return result
+
+    def counters(self):
+        """Returns counter name -> total over the kept frames."""
+        totals = {}
+        for frame in self._frames:
+            for name, value in frame[2].items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def overlay_lines(self):
+        """Returns short text lines for the menu panel, refreshed every ``OVERLAY_INTERVAL``."""
+        now = time.perf_counter()
+        if now - self._overlay_time >= OVERLAY_INTERVAL:
+            self._overlay_time = now
+            parts = ["%s %.2f/%.2f" % (phase, stats["p50_ms"], stats["p95_ms"])
+                     for phase, stats in self.summary().items() if phase != "wait"]
+            # Three phases per line keeps the text inside a 3x3 board's panel
+            self._overlay = ["  ".join(parts[nn:nn + 3]) for nn in range(0, len(parts), 3)]
+            if self._overlay:
+                self._overlay[0] = "ms p50/p95  " + self._overlay[0]
+            if self._frames:
+                self._overlay.append("  ".join(
+                    "%s %d" % (name, value) for name, value in self._frames[-1][2].items()))
+        return self._overlay
+
+    def trace_events(self):
+        """Returns the kept frames as Chrome trace events (timestamps in microseconds)."""
+        events = []
+        origin = self._origin
+        for start, phases, counters in self._frames:
+            end = phases[-1][1] + phases[-1][2] if phases else start
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6})
+            for phase, phase_start, seconds in phases:
+                events.append({"name": phase, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (phase_start - origin) * 1e6, "dur": seconds * 1e6})
+            if counters:
+                events.append({"name": "counters", "ph": "C", "pid": 1, "tid": 1,
+                               "ts": (start - origin) * 1e6, "args": counters})
+        return events
+
+    def dump(self, path):
+        """Writes the kept frames as a Chrome trace JSON file.
+
+        The histograms and the summary go into ``otherData``, which trace
+        viewers ignore.
+        """
+        trace = {
+            "traceEvents": self.trace_events(),
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "frames": self.frames,
+                "bucket_us": [1 << bucket for bucket in range(BUCKETS)],  # Upper bounds
+                "histograms": self.histograms,
+                "summary": self.summary(),
+                "counters": self.counters(),
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f)
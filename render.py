@@ -0,0 +1,387 @@
+"""Sprite cache and dirty-rectangle rendering of the cube grid.
+
+Every cell look (24 cube orientations, the blank, the ``X`` block and the
+numbered cubes of ``digit_mode``) is drawn once into a sprite; the board is
+then painted with plain blits, and after a roll only the two cells the cube
+moved between are blitted and passed to ``display.update``.
+
+Boards larger than the window are shown through a ``Viewport`` that can be
+scrolled and zoomed; only the cells inside it are drawn.
+"""
+
+from pygame import Color, Rect, Surface, display, draw, transform
+
+from cubes import BLANK, BLOCK, DELTA, SIDE_COLORS, TOP_COLOR
+
+BORDER = 5        # Spacing between cubes
+TILE = 10         # Size of a smaller square unit used in drawing
+SHIFT = 3         # Adds perspective effect to cube drawing
+BACKGROUND_COLOR = "#000000"  # Hex code for black background
+GRAY_COLOR = "#808080"
+GRAY_COLOR2 = "#A0A0A0"
+MIN_DRAW_SIZE = 60  # Smaller sprites are drawn at this size and scaled down
+MAX_SPRITES = 16384  # Numbered sprites kept before the cache starts over
+MIN_DIGIT_SIZE = 20  # Tile numbers are left off smaller cells, where they cannot be read
+
+
+def draw_cell(surface, x, y, code, size):
+    """Draws one cell of the board the way the original draw loop did.
+
+    Args:
+        surface: Surface to draw on.
+        x: Left edge of the cell.
+        y: Top edge of the cell.
+        code: Orientation ID, ``BLANK`` or ``BLOCK``.
+        size: Size of the cell in pixels (``CUBE_SIZE``).
+    """
+    if code == BLANK:
+        # Empty cell
+        surface.fill(Color(BACKGROUND_COLOR), Rect(x, y, size, size))
+
+    elif code == BLOCK:
+        # Blocked cube
+        surface.fill(Color(GRAY_COLOR), Rect(x + BORDER, y + BORDER, size - BORDER * 2 + 2, size - BORDER * 2 + 2))
+
+        # Draw diagonal 'X' lines
+        draw.line(surface, GRAY_COLOR2, (x + BORDER + TILE, y + BORDER + TILE),
+                  (x + BORDER + size - BORDER * 2 - TILE, y + BORDER + size - BORDER * 2 - TILE), 10)
+        draw.line(surface, GRAY_COLOR2, (x + BORDER + size - BORDER * 2 - TILE, y + BORDER + TILE),
+                  (x + BORDER + TILE, y + BORDER + size - BORDER * 2 - TILE), 10)
+
+    else:  # Cube with visible faces
+        inner = size - BORDER * 2 - TILE * 2  # Side of the top face
+
+        # Top face
+        surface.fill(Color(TOP_COLOR[code]), Rect(x + BORDER + TILE, y + BORDER + TILE, inner, inner))
+        side_colors = SIDE_COLORS[code]  # Front, left, back and right colors
+
+        # Front face
+        draw.polygon(surface, side_colors[0], [
+            [x + BORDER + TILE, y + size - BORDER - TILE],  # Top left corner
+            [x + BORDER + TILE + inner, y + size - BORDER - TILE],  # Top right corner
+            [x + BORDER + TILE + inner - SHIFT, y + size - BORDER],  # Bottom right corner (shifted inwards)
+            [x + BORDER + TILE + SHIFT, y + size - BORDER]  # Bottom left corner (shifted inwards)
+        ])
+
+        # Left face
+        draw.polygon(surface, side_colors[1], [
+            [x + BORDER, y + BORDER + TILE + SHIFT],  # Top left corner (shifted upwards)
+            [x + BORDER + TILE, y + BORDER + TILE],  # Top right corner
+            [x + BORDER + TILE, y + BORDER + TILE + inner],  # Bottom right corner
+            [x + BORDER, y + BORDER + TILE + inner - SHIFT]  # Bottom left corner (shifted downwards)
+        ])
+
+        # Back face
+        draw.polygon(surface, side_colors[2], [
+            [x + BORDER + TILE + SHIFT, y + BORDER],  # Top left corner (shifted upwards)
+            [x + BORDER + TILE + inner - SHIFT, y + BORDER],  # Top right corner (shifted upwards)
+            [x + BORDER + TILE + inner, y + BORDER + TILE],  # Bottom right corner
+            [x + BORDER + TILE, y + BORDER + TILE]  # Bottom left corner
+        ])
+
+        # Right face
+        draw.polygon(surface, side_colors[3], [
+            [x + size - BORDER - TILE, y + BORDER + TILE],  # Top left corner
+            [x + size - BORDER, y + BORDER + TILE + SHIFT],  # Top right corner (shifted upwards)
+            [x + size - BORDER, y + BORDER + TILE + inner - SHIFT],  # Bottom right corner (shifted downwards)
+            [x + size - BORDER - TILE, y + BORDER + TILE + inner]  # Bottom left corner
+        ])
+
+
+class SpriteCache:
+    """Pre-rendered cell sprites for one cell size.
+
+    The 26 plain sprites are drawn as soon as the size is known; numbered
+    cubes are drawn the first time a (orientation, number) pair is shown.
+
+    Attributes:
+        polygons: Number of face polygons drawn into sprites so far.
+    """
+
+    __slots__ = ("size", "font", "polygons", "_sprites")
+
+    def __init__(self, size, font=None):
+        """Creates the cache.
+
+        Args:
+            size: Size of a cell in pixels (``CUBE_SIZE``).
+            font: Font for the tile numbers of ``digit_mode``.
+        """
+        self.size = None
+        self.font = font
+        self.polygons = 0
+        self._sprites = {}
+        self.resize(size)
+
+    def resize(self, size):
+        """Switches to a new cell size, dropping every sprite of the old one."""
+        if size == self.size:
+            return
+        self.size = size
+        self._sprites = {}
+        for code in range(BLOCK + 1):
+            self._sprites[code, 0] = self._render(code, 0)
+
+    def sprite(self, code, digit=0):
+        """Returns the sprite of a cell.
+
+        Args:
+            code: Orientation ID, ``BLANK`` or ``BLOCK``.
+            digit: Tile number to print on a cube, 0 for none.
+        """
+        if self.size < MIN_DIGIT_SIZE:
+            digit = 0
+        key = (code, digit)
+        surface = self._sprites.get(key)
+        if surface is None:
+            if len(self._sprites) >= MAX_SPRITES:
+                # Large digit boards: keep the plain sprites, forget the numbered ones
+                self._sprites = {key: value for key, value in self._sprites.items() if not key[1]}
+            surface = self._sprites[key] = self._render(code, digit)
+        return surface
+
+    def _render(self, code, digit):
+        size = max(self.size, MIN_DRAW_SIZE)  # The cube drawing needs room for its borders
+        surface = Surface((size, size))
+        surface.fill(Color(BACKGROUND_COLOR))
+        draw_cell(surface, 0, 0, code, size)
+        if code < BLANK:
+            self.polygons += 4  # Front, left, back and right faces
+        if digit and code < BLANK and self.font is not None:
+            text = self.font.render(str(digit), True, BACKGROUND_COLOR)  # Create the number text
+            surface.blit(text, text.get_rect(center=(size / 2, size / 2)))  # Center the text
+        if size != self.size:
+            surface = transform.smoothscale(surface, (self.size, self.size))
+        # Matching the screen format makes every blit a plain copy
+        return surface.convert() if display.get_surface() is not None else surface
+
+
+class Viewport:
+    """The part of a board shown on screen, scrolled and zoomed.
+
+    Positions inside the board are in board pixels: cell (y, x) covers
+    ``x * size .. (x + 1) * size`` horizontally, and the view shows board
+    pixels ``x .. x + width`` and ``y .. y + height``.
+
+    Attributes:
+        rows: Number of rows on the board.
+        cols: Number of columns on the board.
+        width: Width of the view on screen, in pixels.
+        height: Height of the view on screen, in pixels.
+        size: Cell size in pixels (the zoom).
+        x: Board pixel column shown at the left edge of the view.
+        y: Board pixel row shown at the top edge of the view.
+    """
+
+    __slots__ = ("rows", "cols", "width", "height", "size", "x", "y", "min_size", "max_size")
+
+    def __init__(self, rows, cols, width, height, size, min_size=4, max_size=200):
+        """Creates a view of the top left corner of a board.
+
+        Args:
+            rows: Number of rows on the board.
+            cols: Number of columns on the board.
+            width: Width of the view on screen, in pixels.
+            height: Height of the view on screen, in pixels.
+            size: Starting cell size in pixels.
+            min_size: Smallest cell size zooming out can reach.
+            max_size: Largest cell size zooming in can reach.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.width = width
+        self.height = height
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.x = self.y = 0
+
+    def clamp(self):
+        """Keeps the view over the board; a board smaller than the view sits at the top left."""
+        self.x = max(0, min(self.x, self.cols * self.size - self.width))
+        self.y = max(0, min(self.y, self.rows * self.size - self.height))
+
+    def scroll(self, dx, dy):
+        """Moves the view by (dx, dy) board pixels; returns True if it moved."""
+        old = (self.x, self.y)
+        self.x += dx
+        self.y += dy
+        self.clamp()
+        return (self.x, self.y) != old
+
+    def zoom(self, factor, px, py):
+        """Scales the cell size, keeping the board point under view pixel (px, py) in place.
+
+        Returns:
+            True if the cell size changed.
+        """
+        size = max(self.min_size, min(self.max_size, int(round(self.size * factor))))
+        if size == self.size:
+            size = max(self.min_size, min(self.max_size, self.size + (1 if factor > 1 else -1)))
+            if size == self.size:
+                return False
+        # Board position under the pointer, in cells
+        fx = (self.x + px) / self.size
+        fy = (self.y + py) / self.size
+        self.size = size
+        self.x = int(fx * size) - px
+        self.y = int(fy * size) - py
+        self.clamp()
+        return True
+
+    def follow(self, y, x, margin=1):
+        """Scrolls just enough to show cell (y, x) with ``margin`` cells around it.
+
+        Returns:
+            True if the view moved.
+        """
+        size = self.size
+        margin = min(margin, (self.width // size - 1) // 2, (self.height // size - 1) // 2)
+        margin = max(margin, 0)
+        dx = dy = 0
+        if x * size - margin * size < self.x:
+            dx = x * size - margin * size - self.x
+        elif (x + 1 + margin) * size > self.x + self.width:
+            dx = (x + 1 + margin) * size - self.x - self.width
+        if y * size - margin * size < self.y:
+            dy = y * size - margin * size - self.y
+        elif (y + 1 + margin) * size > self.y + self.height:
+            dy = (y + 1 + margin) * size - self.y - self.height
+        return self.scroll(dx, dy)
+
+    def visible(self):
+        """Returns ``(y0, y1, x0, x1)``: the rows ``y0..y1 - 1`` and columns ``x0..x1 - 1`` in view."""
+        size = self.size
+        return (self.y // size, min(self.rows, (self.y + self.height + size - 1) // size),
+                self.x // size, min(self.cols, (self.x + self.width + size - 1) // size))
+
+    def cell_at(self, px, py):
+        """Maps a view pixel to the (y, x) cell under it.
+
+        A pixel on the line between two cells belongs to the cell above or
+        to the left, like the ``xx``/``yy`` math of ``main()``.
+
+        Returns:
+            The (y, x) cell, or None outside the board or the view.
+        """
+        if not (0 <= px < self.width and 0 <= py < self.height):
+            return None
+        x = (self.x + px - 1) // self.size
+        y = (self.y + py - 1) // self.size
+        if 0 <= y < self.rows and 0 <= x < self.cols:
+            return y, x
+        return None
+
+
+class BoardRenderer:
+    """Blits a ``Board`` onto a surface from a ``SpriteCache``.
+
+    With a ``Viewport`` only the cells inside the view are drawn, clipped to
+    the view rect; without one the whole board is drawn.
+
+    Attributes:
+        blits: Number of cell sprites blitted so far.
+    """
+
+    __slots__ = ("screen", "board", "cache", "digit_mode", "left", "top", "viewport", "blits")
+
+    def __init__(self, screen, board, cache, digit_mode=False, left=0, top=0, viewport=None):
+        """Creates the renderer.
+
+        Args:
+            screen: Surface to draw on (usually the display surface).
+            board: The ``Board`` to show.
+            cache: ``SpriteCache`` with the wanted cell size (the viewport's
+                size when there is one).
+            digit_mode: Whether to print the tile numbers.
+            left: Screen x of the top left cell, or of the view.
+            top: Screen y of the top left cell, or of the view.
+            viewport: Optional ``Viewport`` for boards larger than the window.
+        """
+        self.screen = screen
+        self.board = board
+        self.cache = cache
+        self.digit_mode = digit_mode
+        self.left = left
+        self.top = top
+        self.viewport = viewport
+        self.blits = 0
+
+    def view_rect(self):
+        """Returns the screen rect the board is drawn in."""
+        viewport = self.viewport
+        if viewport is None:
+            size = self.cache.size
+            return Rect(self.left, self.top, self.board.size_x * size, self.board.size_y * size)
+        return Rect(self.left, self.top, viewport.width, viewport.height)
+
+    def _origin(self):
+        """Screen position of the top left corner of cell (0, 0)."""
+        viewport = self.viewport
+        if viewport is None:
+            return self.left, self.top
+        return self.left - viewport.x, self.top - viewport.y
+
+    def draw_cell(self, cell):
+        """Blits one cell and returns the screen rect it covers (None when out of view)."""
+        board = self.board
+        size = self.cache.size
+        digit = board.digits[cell] if self.digit_mode else 0
+        left, top = self._origin()
+        x = left + (cell % board.size_x) * size
+        y = top + (cell // board.size_x) * size
+        if self.viewport is None:
+            self.blits += 1
+            return self.screen.blit(self.cache.sprite(board.cells[cell], digit), (x, y))
+        view = self.view_rect()
+        rect = Rect(x, y, size, size).clip(view)
+        if not rect:
+            return None
+        self.screen.set_clip(view)
+        self.blits += 1
+        self.screen.blit(self.cache.sprite(board.cells[cell], digit), (x, y))
+        self.screen.set_clip(None)
+        return rect
+
+    def draw_all(self):
+        """Blits every visible cell; returns the view rect as a one-element list."""
+        board = self.board
+        size = self.cache.size
+        sprite = self.cache.sprite
+        size_x = board.size_x
+        left, top = self._origin()
+        view = self.view_rect()
+        if self.viewport is None:
+            y0, y1, x0, x1 = 0, board.size_y, 0, size_x
+        else:
+            y0, y1, x0, x1 = self.viewport.visible()
+            self.screen.fill(Color(BACKGROUND_COLOR), view)  # Past the board edges
+            self.screen.set_clip(view)
+        blits = []
+        for ny in range(y0, y1):
+            for cell in range(ny * size_x + x0, ny * size_x + x1):
+                digit = board.digits[cell] if self.digit_mode else 0
+                blits.append((sprite(board.cells[cell], digit),
+                              (left + (cell - ny * size_x) * size, top + ny * size)))
+        self.screen.blits(blits, False)
+        self.screen.set_clip(None)
+        self.blits += len(blits)
+        return [view]
+
+    def draw_moves(self, moves):
+        """Blits the visible cells touched by some moves.
+
+        Args:
+            moves: ``[vek, nyp, nxp]`` moves applied since the last draw.
+
+        Returns:
+            The list of dirty screen rects, for ``display.update``.
+        """
+        size_x = self.board.size_x
+        dirty = set()
+        for vek, nyp, nxp in moves:
+            dy, dx = DELTA[vek]
+            dirty.add(nyp * size_x + nxp)  # The cell the cube rolled into
+            dirty.add((nyp - dy) * size_x + nxp - dx)  # The cell it left
+        rects = [self.draw_cell(cell) for cell in dirty]
+        return [rect for rect in rects if rect]
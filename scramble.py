@@ -0,0 +1,121 @@
+"""Fast, reproducible scrambling of boards.
+
+Scrambles are random walks over legal moves only, never undoing the move
+just made, so every step really moves a cube. ``scramble_pack`` derives the
+seed of every puzzle from the pack seed and the puzzle index, so any puzzle
+of a pack can be regenerated on its own.
+"""
+
+import random
+
+import numpy as np
+
+from batch import BoardBatch
+from board import Board
+from cubes import DIRECTIONS, OPPOSITE
+from solver import solve_board
+
+
+def scramble(board, depth, rng=None, min_distance=0, max_extra=1000):
+    """Scrambles a board in place with a random walk of legal moves.
+
+    The move counter, ``moves_stack`` and ``redo_stack`` are cleared
+    afterwards, like the scramble in ``main()`` does.
+
+    Args:
+        board: The ``Board`` to scramble.
+        depth: Number of moves in the walk.
+        rng: A ``random.Random``; a fresh unseeded one when omitted.
+        min_distance: Keep walking until the optimal solution is at least
+            this long (checked with the solver, so keep it small).
+        max_extra: Most extra moves to make while looking for
+            ``min_distance`` before giving up.
+
+    Returns:
+        The moves of the walk, in the ``[vek, nyp, nxp]`` format.
+    """
+    if rng is None:
+        rng = random.Random()
+    walk = []
+    last = None  # (y, x, vek) that would undo the previous move
+    steps = 0
+    limit = depth + max_extra
+    while True:
+        while steps < depth:
+            legal = board.legal_moves()
+            if not legal:
+                break  # Nothing can move at all
+            moves = [move for move in legal if move != last] or legal  # Dead ends may go back
+            y, x, vek = rng.choice(moves)
+            walk.append(board.move(y, x, vek))
+            last = (walk[-1][1], walk[-1][2], OPPOSITE[vek])
+            steps += 1
+        if min_distance <= 0 or steps < depth or steps >= limit:
+            break
+        if solve_board(board, max_depth=min_distance - 1).moves is None:
+            break  # Far enough from every solved state
+        depth = steps + 1  # Too close: take one more step and check again
+    board.moves = 0
+    board.moves_stack = []
+    board.redo_stack = []
+    return walk
+
+
+def scramble_pack(board, count, depth, seed=0, min_distance=0):
+    """Generates reproducible scrambles of a starting board.
+
+    Args:
+        board: The starting ``Board``; it is copied, not modified.
+        count: Number of puzzles.
+        depth: Walk length of every puzzle.
+        seed: Pack seed; puzzle ``i`` uses ``"<seed>:<i>"`` as its own seed.
+        min_distance: Minimum optimal solution length, see ``scramble``.
+
+    Returns:
+        A list of ``count`` new boards.
+    """
+    result = []
+    for index in range(count):
+        puzzle = Board.from_cells(board.size_y, board.size_x, board.cells, board.digits,
+                                  board.digit_mode)
+        scramble(puzzle, depth, random.Random("%d:%d" % (seed, index)), min_distance)
+        result.append(puzzle)
+    return result
+
+
+def scramble_batch(board, count, depth, seed=0):
+    """Generates many scrambles at once with the vectorized simulator.
+
+    The walk uses keyboard rolls, so the board must have exactly one blank.
+    Results are reproducible for a given seed, but differ from
+    ``scramble_pack``'s.
+
+    Args:
+        board: The starting ``Board``.
+        count: Number of puzzles.
+        depth: Walk length of every puzzle.
+        seed: Seed of the NumPy generator.
+
+    Returns:
+        A ``BoardBatch`` holding the scrambled boards.
+    """
+    boards = BoardBatch.from_board(board, count)
+    rng = np.random.default_rng(seed)
+    undo = np.zeros(count, dtype=np.intp)  # Direction that would undo the last roll, 0 for none
+    opposite = np.array(OPPOSITE, dtype=np.intp)
+    rows = np.arange(count)
+    for _ in range(depth):
+        mask = boards.legal_mask()
+        can_undo = undo > 0
+        undo_mask = mask.copy()
+        undo_mask[rows[can_undo], undo[can_undo] - 1] = False
+        # Dead ends may go back
+        mask = np.where(undo_mask.any(axis=1)[:, None], undo_mask, mask)
+        # Pick a random allowed direction per board: the largest random key among them
+        keys = np.where(mask, rng.random(mask.shape), -1.0)
+        directions = keys.argmax(axis=1) + DIRECTIONS[0]
+        directions[~mask.any(axis=1)] = 0
+        boards.step(directions)
+        undo = np.where(directions > 0, opposite[directions], 0)
+    boards.moves[:] = 0
+    return boards
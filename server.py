@@ -0,0 +1,301 @@
+"""Asyncio game server and load generator.
+
+Every connection is one game session holding a ``Board`` in memory. The
+protocol is line based, one command per line, and a client may pipeline as
+many commands as it likes; replies come back in order, one line each:
+
+    NEW <rows> <cols> [digits]  -> OK <rows> <cols>
+    SCRAMBLE <depth> <seed>     -> OK <moves> <solved>
+    ROLL <directions>           -> OK <applied> <moves> <solved>
+    CLICK <y> <x> [<y> <x>...]  -> OK <applied> <moves> <solved>
+    STATE                       -> STATE <moves> <solved> <remaining> <cells hex>
+    QUIT                        -> BYE
+
+``ROLL`` takes a batch of arrow keys as a string of ``U``, ``L``, ``D`` and
+``R``; ``CLICK`` a batch of clicked cells (0-based). ``moves`` counts legal
+moves since the board was created or scrambled and ``solved`` is 0 or 1,
+as in ``main()``. Errors are answered with ``ERR <reason>``; a batch over
+the session's rate limit is not applied and answered with
+``ERR rate <retry ms>``, and one larger than the burst, which could never
+pass, with ``ERR batch too large``. ``NEW`` boards are limited to
+``MAX_CELLS`` cells and charged against the same rate limit by size, so no
+session can stall the event loop by building boards.
+
+    python server.py serve --port 7777
+    python server.py load --port 7777 --clients 500 --batches 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from functools import partial
+
+from board import Board
+from scramble import scramble
+
+MAX_CELLS = 4096     # Largest board (rows * cols) a session can ask for
+CELLS_PER_TOKEN = 16  # NEW costs one move per this many cells (building a cell ~ 1/16 of a move)
+RATE = 5000.0        # Moves per second a session may make on average
+BURST = 1000.0       # Moves a session may make at once
+MAX_LINE = 1 << 16   # Longest command line in bytes
+HIGH_WATER = 1 << 16  # Unsent reply bytes before the server waits for the client to read
+KEYS = {"U": 1, "L": 2, "D": 3, "R": 4}  # Arrow keys of ROLL, as directions
+
+
+class Session:
+    """One connection's board and rate limiter (a token bucket of moves)."""
+
+    __slots__ = ("board", "tokens", "stamp")
+
+    def __init__(self, board):
+        self.board = board
+        self.tokens = BURST
+        self.stamp = time.monotonic()
+
+    def allow(self, cost, rate=RATE, burst=BURST):
+        """Takes ``cost`` tokens if there are enough.
+
+        Returns:
+            0 if the batch may run, otherwise the milliseconds until it could.
+        """
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+        if cost <= self.tokens:
+            self.tokens -= cost
+            return 0
+        return int((cost - self.tokens) / rate * 1000) + 1
+
+
+class GameServer:
+    """Hosts the sessions and counts what they do.
+
+    Attributes:
+        sessions: Number of open sessions.
+        commands: Commands handled since the start.
+        moves: Legal moves applied since the start.
+    """
+
+    __slots__ = ("rate", "burst", "sessions", "commands", "moves")
+
+    def __init__(self, rate=RATE, burst=BURST):
+        """Creates the server.
+
+        Args:
+            rate: Moves per second each session may make on average.
+            burst: Moves each session may make at once.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.sessions = self.commands = self.moves = 0
+
+    def execute(self, session, line):
+        """Runs one command line and returns the reply line (without newline)."""
+        self.commands += 1
+        parts = line.split()
+        if not parts:
+            return "ERR empty"
+        command = parts[0].upper()
+        board = session.board
+        try:
+            if command == "ROLL":
+                keys = parts[1] if len(parts) > 1 else ""
+                if keys.strip("ULDR"):
+                    return "ERR bad arguments"
+                refused = self._charge(session, len(keys))
+                if refused:
+                    return refused
+                applied = 0
+                for key in keys:
+                    if board.roll(KEYS[key]):
+                        applied += 1
+                return self._status(board, applied)
+            if command == "CLICK":
+                cells = [int(value) for value in parts[1:]]
+                if len(cells) % 2:
+                    return "ERR odd coordinates"
+                refused = self._charge(session, len(cells) // 2)
+                if refused:
+                    return refused
+                applied = 0
+                for nn in range(0, len(cells), 2):
+                    if board.click(cells[nn], cells[nn + 1]):
+                        applied += 1
+                return self._status(board, applied)
+            if command == "NEW":
+                rows, cols = int(parts[1]), int(parts[2])
+                if not (rows >= 1 and cols >= 1 and rows * cols <= MAX_CELLS):
+                    return "ERR size"
+                refused = self._charge(session, -(-rows * cols // CELLS_PER_TOKEN))
+                if refused:
+                    return refused
+                digit_mode = len(parts) > 3 and parts[3].lower() in ("1", "digits")
+                session.board = Board(rows, cols, digit_mode)
+                return "OK %d %d" % (rows, cols)
+            if command == "SCRAMBLE":
+                depth, seed = int(parts[1]), int(parts[2])
+                if depth < 0:
+                    return "ERR bad arguments"
+                refused = self._charge(session, depth)
+                if refused:
+                    return refused
+                scramble(board, depth, random.Random(seed))
+                return "OK %d %d" % (board.moves, board.is_solved())
+            if command == "STATE":
+                return "STATE %d %d %d %s" % (board.moves, board.is_solved(), board.remaining,
+                                              board.cells.hex())
+            if command == "QUIT":
+                return "BYE"
+        except (IndexError, KeyError, ValueError):
+            return "ERR bad arguments"
+        return "ERR unknown command"
+
+    def _charge(self, session, cost):
+        """Takes ``cost`` moves from a session's bucket; returns the refusal reply, or None."""
+        if cost > self.burst:
+            return "ERR batch too large"  # The bucket never holds that many tokens
+        wait = session.allow(cost, self.rate, self.burst)
+        if wait:
+            return "ERR rate %d" % wait
+        return None
+
+    def _status(self, board, applied):
+        self.moves += applied
+        del board.moves_stack[:]  # Sessions keep no history: memory stays flat
+        return "OK %d %d %d" % (applied, board.moves, board.is_solved())
+
+    async def handle(self, reader, writer):
+        """Serves one connection until it quits or disconnects."""
+        session = Session(Board(3, 3))
+        self.sessions += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break  # Line too long or connection reset
+                if not line:
+                    break
+                reply = self.execute(session, line.decode("ascii", "replace"))
+                writer.write(reply.encode("ascii") + b"\n")
+                if reply == "BYE":
+                    break
+                # Pipelined commands are answered in one go; wait only when the client lags
+                if writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=7777, path=None):
+        """Listens on TCP ``host:port``, or on the Unix socket ``path`` when given."""
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+
+async def _client(connect, stats, batches, batch, pipeline, size, seed):
+    """One load-generator client: pipelines ROLL batches and times each reply."""
+    reader, writer = await connect()
+    rng = random.Random(seed)
+    writer.write(b"NEW %d %d\n" % (size, size))
+    await writer.drain()
+    await reader.readline()
+    keys = "".join(KEYS)
+    sent = deque()  # Send times of the batches waiting for a reply
+    remaining = batches
+    while remaining or sent:
+        while remaining and len(sent) < pipeline:
+            line = "ROLL " + "".join(rng.choice(keys) for _ in range(batch)) + "\n"
+            writer.write(line.encode("ascii"))
+            sent.append(time.perf_counter())
+            remaining -= 1
+        await writer.drain()
+        reply = await reader.readline()
+        stats["latencies"].append(time.perf_counter() - sent.popleft())
+        parts = reply.split()
+        if parts[0] == b"OK":
+            stats["moves"] += int(parts[1])
+            stats["rolls"] += batch
+        else:
+            stats["errors"] += 1
+    writer.write(b"QUIT\n")
+    await writer.drain()
+    await reader.readline()
+    writer.close()
+
+
+async def load(host="127.0.0.1", port=7777, path=None, clients=100, batches=100, batch=10,
+               pipeline=4, size=3):
+    """Runs the load generator.
+
+    Args:
+        host: Server host.
+        port: Server TCP port.
+        path: Unix socket path, used instead of TCP when given.
+        clients: Concurrent sessions.
+        batches: ROLL batches each client sends.
+        batch: Arrow keys per batch.
+        pipeline: Batches a client keeps in flight.
+        size: Board side of every session.
+
+    Returns:
+        A dict with ``moves_per_sec``, ``rolls_per_sec``, ``p50_ms``,
+        ``p99_ms``, ``errors`` and ``seconds``.
+    """
+    if path:
+        connect = partial(asyncio.open_unix_connection, path, limit=MAX_LINE)
+    else:
+        connect = partial(asyncio.open_connection, host, port, limit=MAX_LINE)
+    stats = {"latencies": [], "moves": 0, "rolls": 0, "errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(connect, stats, batches, batch, pipeline, size, nn)
+                           for nn in range(clients)])
+    seconds = time.perf_counter() - start
+    latencies = sorted(stats["latencies"]) or [0.0]
+    return {
+        "moves_per_sec": stats["moves"] / seconds,
+        "rolls_per_sec": stats["rolls"] / seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000,
+        "errors": stats["errors"],
+        "seconds": seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling Cubes game server")
+    parser.add_argument("mode", choices=("serve", "load"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    parser.add_argument("--rate", type=float, default=RATE, help="moves/s per session")
+    parser.add_argument("--burst", type=float, default=BURST, help="moves per session at once")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=10)
+    parser.add_argument("--pipeline", type=int, default=4)
+    parser.add_argument("--size", type=int, default=3)
+    args = parser.parse_args(argv)
+    if args.mode == "serve":
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)  # Left over from an earlier run
+        asyncio.run(GameServer(args.rate, args.burst).serve(args.host, args.port, args.unix))
+    else:
+        result = asyncio.run(load(args.host, args.port, args.unix, args.clients, args.batches,
+                                  args.batch, args.pipeline, args.size))
+        for name, value in result.items():
+            print("%-14s %.2f" % (name, value))
+
+
+if __name__ == "__main__":
+    main()
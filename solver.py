@@ -0,0 +1,367 @@
+"""Optimal solver for Rolling Cubes boards.
+
+``solve`` runs IDA* on the ``init_level`` representation (including ``X``
+blocked cells and several blanks) and returns the shortest move list in the
+``[vek, nyp, nxp]`` format of ``moves_stack``.
+
+The heuristic is the sum, over all cubes, of the number of rolls a lone cube
+would need to reach a solved orientation on an allowed cell of an otherwise
+empty board (blocked cells still in place). Every move rolls exactly one cube
+by one cell, so the sum never overestimates. In digit mode the allowed cells
+of each tile are the cells it can occupy in a solved layout, which makes the
+table at least as strong as a Manhattan distance to the target.
+
+Pattern databases (see ``pattern_db``) can be passed in to strengthen the
+heuristic on 3x3 and larger boards.
+"""
+
+import sys
+import time
+from array import array
+from collections import deque
+
+from board import Board, neighbor_table
+from cubes import BLANK, BLOCK, DIRECTIONS, OPPOSITE, ROLL, SOLVED_ORIENT
+from pattern_db import cover
+from zobrist import cell_keys, roll_key, tile_key
+
+UNREACHABLE = 255  # Table value of a (cell, orientation) that can never be solved
+TT_MIN_SLACK = 4  # Nodes with less room under the bound are cheaper to search than to look up
+
+
+class SolveResult:
+    """Outcome of a ``solve`` call.
+
+    Attributes:
+        moves: The optimal move list (``[vek, nyp, nxp]`` per move), or None
+            if no solution was found within ``max_depth``.
+        nodes: Number of search nodes expanded.
+        seconds: Wall-clock time of the search, including table setup.
+        memory: Bytes held by the heuristic tables and the search path.
+        budget: ``"nodes"`` or ``"time"`` when the search stopped because that
+            budget ran out, ``"stopped"`` when ``stop`` ended it (``moves`` is
+            then None), otherwise None.
+    """
+
+    __slots__ = ("moves", "nodes", "seconds", "memory", "budget")
+
+    def __init__(self, moves, nodes, seconds, memory, budget=None):
+        self.moves = moves
+        self.nodes = nodes
+        self.seconds = seconds
+        self.memory = memory
+        self.budget = budget
+
+    @property
+    def solved(self):
+        return self.moves is not None
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        length = len(self.moves) if self.moves is not None else None
+        return ("SolveResult(length=%s, nodes=%d, nodes_per_sec=%.0f, memory=%d)"
+                % (length, self.nodes, self.nodes_per_sec, self.memory))
+
+
+class _OutOfBudget(Exception):
+    """Unwinds the search when the node or time budget runs out, or it is stopped."""
+
+
+def _distance_table(board, targets):
+    """Builds the lone-cube roll distance table for one set of target cells.
+
+    Args:
+        board: The board whose size and blocked cells are used.
+        targets: Flat indices of the cells where the cube may end up.
+
+    Returns:
+        A bytearray indexed by ``cell * 24 + orientation`` holding the minimum
+        number of rolls to reach a solved orientation on a target cell.
+    """
+    cells = board.cells
+    nxt = neighbor_table(board.size_y, board.size_x)
+    table = bytearray([UNREACHABLE]) * (len(cells) * 24)
+    queue = deque()
+    for cell in targets:
+        for orient in range(24):
+            if SOLVED_ORIENT[orient]:
+                table[cell * 24 + orient] = 0
+                queue.append((cell, orient))
+
+    # Rolls are reversible, so a search from the goals gives the distances to them
+    while queue:
+        cell, orient = queue.popleft()
+        dist = table[cell * 24 + orient] + 1
+        for vek in DIRECTIONS:
+            dst = nxt[vek][cell]
+            if dst < 0 or cells[dst] == BLOCK:
+                continue
+            index = dst * 24 + ROLL[orient][vek]
+            if table[index] == UNREACHABLE:
+                table[index] = min(dist, UNREACHABLE - 1)
+                queue.append((dst, ROLL[orient][vek]))
+    return table
+
+
+def heuristic_tables(board):
+    """Builds the per-tile distance tables used by the solver.
+
+    Args:
+        board: The board to solve.
+
+    Returns:
+        A list indexed by tile number (``board.digits``). Without digit mode
+        every entry is the same table; in digit mode each tile gets its own.
+    """
+    open_cells = [cell for cell, code in enumerate(board.cells) if code != BLOCK]
+    tiles = max(board.digits, default=0)
+    if not board.digit_mode:
+        return [_distance_table(board, open_cells)] * (tiles + 1)
+
+    # Tile k is preceded by k - 1 tiles and 0..blanks blanks in a solved layout
+    blanks = len(board.blanks)
+    tables = [None]
+    for tile in range(1, tiles + 1):
+        tables.append(_distance_table(board, open_cells[tile - 1:tile + blanks]))
+    return tables
+
+
+def table_key(board):
+    """Returns what the heuristic tables of a board depend on, for caching them."""
+    blocked = bytes(code == BLOCK for code in board.cells)
+    return (board.size_y, board.size_x, blocked, len(board.blanks), board.digit_mode,
+            max(board.digits, default=0))
+
+
+def heuristic(board, tables):
+    """Returns the per-cube heuristic of a board: a lower bound on its solution length.
+
+    Args:
+        board: The board.
+        tables: Heuristic tables from ``heuristic_tables``.
+
+    Returns:
+        The sum of the table values of the cubes, or None when some cube can
+        never be solved.
+    """
+    h = 0
+    digits = board.digits
+    for cell, code in enumerate(board.cells):
+        if code < BLANK:
+            value = tables[digits[cell]][cell * 24 + code]
+            if value == UNREACHABLE:
+                return None
+            h += value
+    return h
+
+
+def _digits_in_order(digits):
+    """Checks that the tile numbers read 1, 2, 3... row by row."""
+    num = 1
+    for dig in digits:
+        if dig:
+            if dig != num:
+                return False
+            num += 1
+    return True
+
+
+def solve_board(board, max_depth=80, tables=None, pdbs=None, tt=None, max_nodes=None,
+                time_limit=None, stop=None, progress=None):
+    """Finds an optimal solution for a board with IDA*.
+
+    The board itself is not modified.
+
+    Args:
+        board: The ``Board`` to solve.
+        max_depth: Give up when no solution of at most this length exists.
+        tables: Heuristic tables from ``heuristic_tables``, built when omitted.
+        pdbs: Optional ``PatternDB`` objects; those matching the board are
+            assigned to disjoint groups of cubes and added to the heuristic.
+        tt: Optional ``zobrist.TranspositionTable``; states already reached
+            with a smaller or equal move count in the same iteration are
+            skipped. It is cleared at the start of every iteration. Only
+            nodes whose ``f`` is at least ``TT_MIN_SLACK`` below the bound
+            use it; ``f`` never decreases along a path, so the nodes under
+            the others need no keys. It saves nodes but not time: on 3x3
+            digit boards it cuts 10-15% of the nodes, and the pure Python
+            probes and key updates make the solve about 20% slower.
+        max_nodes: Give up after expanding this many nodes.
+        time_limit: Give up after this many seconds (checked every 1024 nodes).
+        stop: Optional callable polled every 1024 nodes and between
+            iterations; the search gives up as soon as it returns true.
+        progress: Optional callable, called after every iteration that found
+            no solution, and when the node or time budget runs out, as
+            ``progress(distance, nodes, closest)``. ``distance`` is a lower
+            bound on the solution length proven so far and ``closest`` the
+            move list leading to the state with the lowest heuristic (fewest
+            moves on ties) reached so far, which makes the search usable
+            before it finishes, even inside a first iteration too large for
+            the budget.
+
+    Returns:
+        A ``SolveResult``.
+    """
+    start = time.perf_counter()
+    node_limit = max_nodes if max_nodes is not None else -1
+    deadline = start + time_limit if time_limit is not None else None
+    if tables is None:
+        tables = heuristic_tables(board)
+    cells = bytearray(board.cells)
+    digits = array("I", board.digits)
+    blanks = list(board.blanks)
+    back = [neighbor_table(board.size_y, board.size_x)[OPPOSITE[vek]] if vek else ()
+            for vek in range(5)]  # back[vek][dst]: the cell that rolls into dst
+    digit_mode = board.digit_mode
+    groups = cover(board, pdbs) if pdbs else []
+    where = array("I", [0]) * (len(tables) + 1)  # Tile number -> cell
+    for cell, dig in enumerate(digits):
+        where[dig] = cell
+    keys = cell_keys(len(cells))
+    path = []
+    nodes = 0
+    track = progress is not None
+    closest = [UNREACHABLE * len(cells), 0, []]  # Lowest heuristic reached, its move count and path
+
+    group_of = array("i", [-1]) * len(where)  # Tile number -> its group, -1 for none
+    for nn, (pdb, group) in enumerate(groups):
+        for tile in group:
+            group_of[tile] = nn
+
+    def group_bonus(nn):
+        # What one pattern database adds on top of the per-cube tables of its group
+        pdb, group = groups[nn]
+        base = 0
+        for tile in group:
+            cell = where[tile]
+            base += tables[tile][cell * 24 + cells[cell]]
+        value = pdb.value(blanks, where, cells, group)
+        return value - base if value > base else 0
+
+    # A roll of a cube outside a group is free and reversible in the group's
+    # abstraction, so it leaves the database value unchanged: each move only
+    # redoes the bonus of the moved tile's group, like h
+    bonus = [group_bonus(nn) for nn in range(len(groups))]
+    h = heuristic(board, tables)
+
+    def search(g, bound, h, extra, prev_src, prev_dst, key):
+        nonlocal nodes
+        if track and g and (h < closest[0] or (h == closest[0] and g < closest[1])):
+            closest[:] = h, g, path[:]
+        f = g + h + extra
+        if f > bound:
+            return f
+        if h == 0 and (not digit_mode or _digits_in_order(digits)):
+            return -1  # Solved
+        hashed = tt is not None and bound - f >= TT_MIN_SLACK
+        if hashed:
+            seen = tt.probe(key)
+            if seen is not None and seen[1] <= g:
+                return UNREACHABLE * len(cells)  # Already searched from here with more moves left
+            tt.store(key, bound - g, g)
+        nodes += 1
+        if nodes == node_limit:
+            raise _OutOfBudget("nodes")
+        if not nodes & 1023:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise _OutOfBudget("time")
+            if stop is not None and stop():
+                raise _OutOfBudget("stopped")
+        best = UNREACHABLE * len(cells)
+        for nb, dst in enumerate(blanks):
+            for vek in DIRECTIONS:
+                src = back[vek][dst]
+                if src < 0 or (src == prev_dst and dst == prev_src):
+                    continue  # Off the board, or undoing the previous move
+                orient = cells[src]
+                if orient >= BLANK:
+                    continue
+                table = tables[digits[src]]
+                rolled = ROLL[orient][vek]
+                cells[dst] = rolled
+                cells[src] = BLANK
+                tile = digits[dst] = digits[src]
+                digits[src] = 0
+                where[tile] = dst
+                blanks[nb] = src
+                path.append((vek, dst))
+
+                if hashed:
+                    child_key = roll_key(key, keys, src, dst, orient, rolled)
+                    if digit_mode:
+                        child_key ^= tile_key(src, tile) ^ tile_key(dst, tile)
+                else:
+                    child_key = 0
+                nn = group_of[tile]
+                if nn >= 0:
+                    old = bonus[nn]
+                    bonus[nn] = group_bonus(nn)
+                    child_extra = extra - old + bonus[nn]
+                else:
+                    child_extra = extra
+                t = search(g + 1, bound, h - table[src * 24 + orient] + table[dst * 24 + rolled],
+                           child_extra, src, dst, child_key)
+                if t < 0:
+                    return t
+
+                if nn >= 0:
+                    bonus[nn] = old
+                path.pop()
+                where[tile] = src
+                blanks[nb] = dst
+                digits[src] = digits[dst]
+                digits[dst] = 0
+                cells[src] = orient
+                cells[dst] = BLANK
+                if t < best:
+                    best = t
+        return best
+
+    moves = None
+    budget = None
+    if h is not None:
+        bound = h + sum(bonus)
+        try:
+            while bound <= max_depth:
+                if tt is not None:
+                    tt.clear()
+                t = search(0, bound, h, sum(bonus), -1, -1, board.key)
+                if t < 0:
+                    moves = [[vek, dst // board.size_x, dst % board.size_x] for vek, dst in path]
+                    break
+                if track:
+                    progress(t, nodes, [[vek, dst // board.size_x, dst % board.size_x]
+                                        for vek, dst in closest[2]])
+                bound = t
+                if stop is not None and stop():
+                    raise _OutOfBudget("stopped")
+        except _OutOfBudget as exc:
+            budget = exc.args[0]
+            if track and budget != "stopped":
+                # Only the bounds below this iteration's are ruled out
+                progress(bound, nodes, [[vek, dst // board.size_x, dst % board.size_x]
+                                        for vek, dst in closest[2]])
+
+    memory = sum(sys.getsizeof(table) for table in {id(t): t for t in tables[1:]}.values())
+    memory += sys.getsizeof(path) + sys.getsizeof(cells) + sys.getsizeof(digits)
+    return SolveResult(moves, nodes, time.perf_counter() - start, memory, budget)
+
+
+def solve(level, level_digit=None, digit_mode=False, max_depth=80, pdbs=None):
+    """Finds an optimal solution for a ``level``/``level_digit`` board.
+
+    Args:
+        level: Rows of ``[top, face]`` cells, as made by ``init_level``.
+        level_digit: Rows of tile number strings (``init_level_digit``);
+            numbered row by row when omitted.
+        digit_mode: Whether the tile numbers must be in order too.
+        max_depth: Give up when no solution of at most this length exists.
+        pdbs: Optional ``PatternDB`` objects to strengthen the heuristic.
+
+    Returns:
+        A ``SolveResult`` whose ``moves`` can be replayed into ``moves_stack``.
+    """
+    return solve_board(Board.from_level(level, level_digit, digit_mode), max_depth, pdbs=pdbs)
@@ -0,0 +1,96 @@
+"""Multi-user Streamlit front end.
+
+    streamlit run webapp.py
+
+Every browser session keeps its own ``Board`` in ``st.session_state`` and
+plays through Streamlit widgets. Frames are rendered off-screen by one
+``FrameRenderer`` shared by all sessions, so the server needs no window or
+display, and one player never blocks another the way the pygame ``main()``
+behind the Play button of ``game.py`` does.
+"""
+
+import os
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Never open a window on the server
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import streamlit as st
+
+from board import Board
+from frames import FrameRenderer
+from scramble import scramble
+
+SIZE_X_START = 3  # Initial width of the game board
+SIZE_Y_START = 3  # Initial height of the game board
+MAX_SIZE = 100    # Largest board a session can ask for
+SCRAMBLE_DEPTH = 100  # Number of random moves made by the Scramble button
+
+
+@st.cache_resource
+def frame_renderer():
+    """Returns the frame renderer shared by every session of the server."""
+    return FrameRenderer()
+
+
+def new_game():
+    """Starts a new board in this session from the sidebar settings."""
+    state = st.session_state
+    state.board = Board(state.rows, state.cols, state.digit_mode)
+    state.seed = None
+
+
+def scramble_board():
+    """Scrambles this session's board with a fresh, recorded seed."""
+    state = st.session_state
+    state.seed = random.getrandbits(32)
+    scramble(state.board, SCRAMBLE_DEPTH, random.Random(state.seed))
+
+
+def roll(vek):
+    """Rolls the cube next to the blank, like an arrow key."""
+    st.session_state.board.roll(vek)
+
+
+def click():
+    """Rolls the cube on the chosen cell into a neighboring blank, like a mouse click."""
+    state = st.session_state
+    state.board.click(state.cell_y - 1, state.cell_x - 1)
+
+
+def main():
+    state = st.session_state
+    st.title("Rolling Cubes Game")
+
+    with st.sidebar:
+        st.number_input("Rows", 1, MAX_SIZE, SIZE_Y_START, key="rows")
+        st.number_input("Columns", 1, MAX_SIZE, SIZE_X_START, key="cols")
+        st.checkbox("Tile numbers", key="digit_mode")
+        st.button("New game", on_click=new_game)
+        st.button("Scramble", on_click=scramble_board)
+    if "board" not in state:
+        new_game()
+    board = state.board
+
+    st.image(frame_renderer().png(board))
+
+    # Arrow pad: the cube next to the blank rolls into it
+    left, middle, right = st.columns(3)
+    middle.button("Up", on_click=roll, args=(1,), use_container_width=True)
+    left.button("Left", on_click=roll, args=(2,), use_container_width=True)
+    middle.button("Down", on_click=roll, args=(3,), use_container_width=True)
+    right.button("Right", on_click=roll, args=(4,), use_container_width=True)
+
+    # Click a cell by its row and column
+    row, column, go = st.columns(3)
+    row.number_input("Row", 1, board.size_y, 1, key="cell_y")
+    column.number_input("Column", 1, board.size_x, 1, key="cell_x")
+    go.button("Roll cube", on_click=click, use_container_width=True)
+
+    status = "Solved" if board.is_solved() else "Not Solved"
+    st.write("Moves: %d | %s | Left: %d" % (board.moves, status, board.remaining))
+    if state.seed is not None:
+        st.caption("Scramble seed: %d" % state.seed)
+
+
+main()
@@ -0,0 +1,214 @@
+"""Zobrist hashing of board states and a fixed-size transposition table.
+
+A state key is the XOR of one random 64-bit key per (cell, cell code), so
+the blank positions are part of it, plus, in digit mode, one key per
+(cell, tile number). A roll changes four cell entries and two tile entries,
+so ``Board`` keeps its key up to date in O(1) per move.
+"""
+
+import random
+from array import array
+
+from cubes import BLANK, BLOCK
+
+CODES = BLOCK + 1  # Cell codes per cell: 24 orientations, BLANK and BLOCK
+_MASK = (1 << 64) - 1
+TABLE_CELLS = 4096  # Largest board (in cells) with a key table; 26 keys per cell
+_CELL_KEYS = []  # The key list of TABLE_CELLS cells, built on first use
+
+
+def cell_keys(ncells):
+    """Returns the keys of a board size, indexed by ``cell * CODES + code``.
+
+    Boards up to ``TABLE_CELLS`` cells all share one list of random keys
+    (a board only uses its first ``ncells * CODES``), so a new board size
+    costs neither time nor memory; larger ones get a ``HashedKeys`` that
+    computes each key on demand.
+    """
+    if ncells > TABLE_CELLS:
+        return HashedKeys()
+    if not _CELL_KEYS:
+        rng = random.Random(TABLE_CELLS)  # Fixed seed: keys are the same in every process
+        keys = [rng.getrandbits(64) for _ in range(TABLE_CELLS * CODES)]
+        for cell in range(TABLE_CELLS):
+            keys[cell * CODES + BLOCK] = 0  # Blocked cells never change
+        _CELL_KEYS[:] = keys
+    return _CELL_KEYS
+
+
+def _mix(value):
+    """The splitmix64 finalizer: a well-spread 64-bit hash of ``value``."""
+    z = (value + 0x9E3779B97F4A7C15) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class HashedKeys:
+    """Cell keys computed on demand, for boards too large for a key table."""
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if index % CODES == BLOCK:
+            return 0  # Blocked cells never change
+        return _mix(index | 1 << 62)  # Keep clear of the tile keys
+
+
+def tile_key(cell, tile):
+    """Returns the key of tile number ``tile`` on ``cell`` (0 for no tile).
+
+    Computed with the splitmix64 mixer instead of a table, so very large
+    boards do not need a cells x tiles table.
+    """
+    if not tile:
+        return 0
+    return _mix(cell << 32 | tile)
+
+
+def state_key(cells, digits, digit_mode):
+    """Computes the key of a state from scratch.
+
+    Args:
+        cells: Cell codes, row by row.
+        digits: Tile numbers, row by row.
+        digit_mode: Whether the tile numbers are part of the state.
+    """
+    keys = cell_keys(len(cells))
+    key = 0
+    for cell, code in enumerate(cells):
+        key ^= keys[cell * CODES + code]
+    if digit_mode:
+        for cell, tile in enumerate(digits):
+            key ^= tile_key(cell, tile)
+    return key
+
+
+def roll_key(key, keys, src, dst, orient, rolled):
+    """Updates a key for a cube rolling from ``src`` into the blank ``dst``.
+
+    Args:
+        key: Key before the roll.
+        keys: ``cell_keys`` of the board size.
+        src: Cell the cube leaves.
+        dst: Blank cell the cube rolls into.
+        orient: Orientation of the cube before the roll.
+        rolled: Orientation after the roll.
+
+    Returns:
+        The key after the roll (without the tile part, see ``tile_key``).
+    """
+    return (key ^ keys[src * CODES + orient] ^ keys[src * CODES + BLANK]
+            ^ keys[dst * CODES + BLANK] ^ keys[dst * CODES + rolled])
+
+
+class TranspositionTable:
+    """Fixed-memory, set-associative table from state keys to (depth, value).
+
+    Each key maps to a bucket of ``ways`` slots. When a bucket is full the
+    replacement policy picks the victim: ``"depth"`` evicts the entry with
+    the smallest depth, ``"lru"`` the one used least recently.
+
+    Attributes:
+        hits: Successful ``probe`` calls.
+        misses: ``probe`` calls that found nothing.
+        stores: ``store`` calls.
+        replacements: Stores that evicted another key.
+    """
+
+    __slots__ = ("policy", "ways", "_mask", "_keys", "_depths", "_values", "_stamps", "_clock",
+                 "hits", "misses", "stores", "replacements")
+
+    def __init__(self, entries=1 << 16, ways=4, policy="depth"):
+        """Allocates the table.
+
+        Args:
+            entries: Number of slots, rounded up to a power of two.
+            ways: Slots per bucket.
+            policy: ``"depth"`` (depth-preferred) or ``"lru"``.
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if policy not in ("depth", "lru"):
+            raise ValueError("unknown replacement policy %r" % policy)
+        self.policy = policy
+        self.ways = ways
+        buckets = 1
+        while buckets * ways < entries:
+            buckets *= 2
+        self._mask = buckets - 1
+        size = buckets * ways
+        self._keys = array("Q", [0]) * size  # 0 marks an empty slot
+        self._depths = array("i", [0]) * size
+        self._values = array("q", [0]) * size
+        self._stamps = array("Q", [0]) * size
+        self._clock = 0
+        self.hits = self.misses = self.stores = self.replacements = 0
+
+    @property
+    def nbytes(self):
+        """Memory held by the slots; it never grows."""
+        return sum(table.itemsize * len(table)
+                   for table in (self._keys, self._depths, self._values, self._stamps))
+
+    @property
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def _slot(self, key):
+        key = key or 1  # Keep 0 free for empty slots
+        first = (key & self._mask) * self.ways
+        keys = self._keys
+        for slot in range(first, first + self.ways):
+            if keys[slot] == key:
+                return key, first, slot
+        return key, first, -1
+
+    def probe(self, key):
+        """Looks a state up.
+
+        Returns:
+            The stored ``(depth, value)`` pair, or None.
+        """
+        key, first, slot = self._slot(key)
+        if slot < 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == "lru":
+            self._clock += 1
+            self._stamps[slot] = self._clock
+        return self._depths[slot], self._values[slot]
+
+    def store(self, key, depth, value):
+        """Stores (or overwrites) the entry of a state."""
+        self.stores += 1
+        key, first, slot = self._slot(key)
+        if slot < 0:
+            keys = self._keys
+            # Victim: the shallowest entry, or the least recently used one
+            rank = self._depths if self.policy == "depth" else self._stamps
+            slot = first
+            for candidate in range(first, first + self.ways):
+                if keys[candidate] == 0:
+                    slot = candidate
+                    break
+                if rank[candidate] < rank[slot]:
+                    slot = candidate
+            else:
+                self.replacements += 1
+            keys[slot] = key
+        self._depths[slot] = depth
+        self._values[slot] = value
+        self._clock += 1
+        self._stamps[slot] = self._clock
+
+    def clear(self):
+        """Empties the table; the counters are kept."""
+        size = len(self._keys)
+        self._keys = array("Q", bytes(8 * size))  # Only the keys: other slots are overwritten on store
+        if self.policy == "lru":
+            self._stamps = array("Q", bytes(8 * size))
+            self._clock = 0